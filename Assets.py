@@ -0,0 +1,79 @@
+import base64
+import hashlib
+import mimetypes
+import os
+import re
+import shutil
+from functools import lru_cache
+
+import streamlit as st
+
+# Streamlit serves files under ./static at app/static/ when server.enableStaticServing is on
+STATIC_DIR = "static"
+STATIC_URL_PREFIX = "app/static"
+# Published copies of assets, named by content hash so browsers can cache them indefinitely
+PUBLISHED_DIR = os.path.join(STATIC_DIR, "cache")
+
+
+# Function to key cached work on a file's modification time and size, so edits are picked up without a restart
+def file_signature(path: str) -> tuple:
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+@lru_cache(maxsize=64)
+def _read_file(signature: tuple) -> bytes:
+    with open(signature[0], "rb") as f:
+        return f.read()
+
+
+@lru_cache(maxsize=64)
+def _encode(signature: tuple) -> str:
+    return base64.b64encode(_read_file(signature)).decode()
+
+
+# Function to base64-encode a file once per process (and again only when the file changes)
+def encode_file(path: str) -> str:
+    return _encode(file_signature(path))
+
+
+@lru_cache(maxsize=64)
+def _publish(signature: tuple) -> str:
+    path = signature[0]
+    digest = hashlib.sha256(_read_file(signature)).hexdigest()[:16]
+    name = f"{digest}-{os.path.basename(path)}"
+    target = os.path.join(PUBLISHED_DIR, name)
+    if not os.path.exists(target):
+        os.makedirs(PUBLISHED_DIR, exist_ok=True)
+        shutil.copyfile(path, target)
+    return f"{STATIC_URL_PREFIX}/cache/{name}"
+
+
+# Function to get a URL for an image: a static file URL when static serving is enabled,
+# otherwise a (cached) data URI
+def asset_url(path: str) -> str:
+    signature = file_signature(path)
+    if st.get_option("server.enableStaticServing"):
+        return _publish(signature)
+    mime_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    return f"data:{mime_type};base64,{_encode(signature)}"
+
+
+# Function to minify CSS: drops comments and the whitespace around punctuation
+@lru_cache(maxsize=64)
+def minify_css(css: str) -> str:
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+
+@lru_cache(maxsize=64)
+def _style_block(css: str) -> str:
+    return f"<style>{minify_css(css)}</style>"
+
+
+# Function to inject page CSS; the minified <style> block is built once per distinct stylesheet
+def inject_css(css: str):
+    st.markdown(_style_block(css), unsafe_allow_html=True)
@@ -0,0 +1,239 @@
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional
+
+import pandas as pd
+import streamlit as st
+
+from Claud import (
+    compare_and_execute_queries,
+    get_model_router,
+    get_run_store,
+    get_snowflake_connection,
+    query_sql_checker_tool,
+    route_completion,
+)
+from Explain import compare_query_plans
+from Extraction import extract_sql
+from Fetch import read_arrow
+from Rewrite import build_optimize_prompt
+from RunStore import UNKNOWN_MODEL
+from Sample import DEFAULT_SAMPLE_PERCENT, validate_on_sample
+
+logger = logging.getLogger(__name__)
+
+# Batch defaults
+DEFAULT_TOP_N = 20
+DEFAULT_DAYS = 7
+DEFAULT_WORKERS = 4
+RANKINGS = ("elapsed", "credits")
+
+# Columns of the progress table, in display order
+PROGRESS_COLUMNS = [
+    'parameterized_hash', 'executions', 'total_elapsed_s', 'credits', 'status',
+    'plan_verdict', 'original_time', 'optimized_time', 'results_match', 'optimized_query', 'error',
+]
+
+
+# Function to build the history query: one representative per parameterized hash, ranked by total cost
+def build_expensive_queries_sql(ranking: str = "elapsed") -> str:
+    if ranking not in RANKINGS:
+        raise ValueError(f"Unknown ranking: {ranking}")
+    order_column = "total_credits" if ranking == "credits" else "total_elapsed_time"
+    return f"""
+        WITH history AS (
+            SELECT qh.query_text, qh.start_time,
+                   COALESCE(qh.query_parameterized_hash, qh.query_id) AS query_parameterized_hash,
+                   qh.total_elapsed_time, COALESCE(qa.credits_attributed_compute, 0) AS credits
+            FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY qh
+            LEFT JOIN SNOWFLAKE.ACCOUNT_USAGE.QUERY_ATTRIBUTION_HISTORY qa
+                ON qa.query_id = qh.query_id
+            WHERE qh.query_type = 'SELECT'
+            AND qh.execution_status = 'SUCCESS'
+            AND qh.start_time >= DATEADD(day, -?, CURRENT_TIMESTAMP())
+        )
+        SELECT query_parameterized_hash,
+               MAX_BY(query_text, start_time) AS query_text,
+               COUNT(*) AS executions,
+               SUM(total_elapsed_time) / 1000 AS total_elapsed_time,
+               SUM(credits) AS total_credits
+        FROM history
+        GROUP BY query_parameterized_hash
+        ORDER BY {order_column} DESC
+        LIMIT ?;
+    """
+
+
+# Function to pull the top-N expensive SELECT queries, deduplicated by parameterized hash
+def fetch_expensive_queries(top_n: int = DEFAULT_TOP_N, days: int = DEFAULT_DAYS, ranking: str = "elapsed") -> pd.DataFrame:
+    logger.info(f"Fetching top {top_n} queries by {ranking} over the last {days} days.")
+    conn = get_snowflake_connection()
+    try:
+        result = read_arrow(build_expensive_queries_sql(ranking), conn, params=(days, top_n))
+    finally:
+        conn.close()
+    result.columns = [column.lower() for column in result.columns]
+    return result.drop_duplicates(subset='query_parameterized_hash').reset_index(drop=True)
+
+
+# Function to run checker -> optimizer -> validation for one query
+# plan_first compares EXPLAIN plans and only executes the queries when the estimate is ambiguous
+# sample_percent validates on a seeded sample of the tables instead of the full tables
+def optimize_one(query_text: str, validate: bool = True, plan_first: bool = False,
+                 sample_percent: Optional[float] = None) -> dict:
+    outcome = {}
+    try:
+        prior_run = get_run_store().find_verified_run(query_text)
+        if prior_run is not None:
+            outcome.update(
+                status='reused',
+                optimized_query=prior_run.optimized_query,
+                original_time=prior_run.original_time,
+                optimized_time=prior_run.optimized_time,
+                results_match=prior_run.results_match,
+            )
+            return outcome
+        candidate_run = get_run_store().find_candidate_run(query_text)
+        if candidate_run is not None:
+            # Adapted from a verified variant: unverified until the validation below runs
+            checked_query, optimized_query = candidate_run.checked_query, candidate_run.optimized_query
+            model = None if candidate_run.model == UNKNOWN_MODEL else candidate_run.model
+            outcome.update(status='adapted', optimized_query=optimized_query)
+        else:
+            checked_query = extract_sql(query_sql_checker_tool(query_text))
+            model, completion = route_completion(build_optimize_prompt(checked_query), "optimize")
+            optimized_query = extract_sql(completion)
+            outcome.update(status='optimized', optimized_query=optimized_query)
+        if validate and plan_first:
+            plan_comparison = compare_query_plans(get_snowflake_connection, query_text, optimized_query)
+            outcome.update(status='estimated', plan_verdict=plan_comparison.verdict)
+            if plan_comparison.verdict != "ambiguous":
+                return outcome
+        if validate and sample_percent:
+            validation = validate_on_sample(get_snowflake_connection, query_text, optimized_query, percent=sample_percent)
+            outcome.update(
+                status='sampled' if validation.conclusive else 'sample empty',
+                original_time=validation.original_stats.get('execution_time'),
+                optimized_time=validation.optimized_stats.get('execution_time'),
+                results_match=validation.results_match,
+            )
+            return outcome
+        if validate:
+            comparison_results = compare_and_execute_queries(query_text, optimized_query, verification="server")
+            if comparison_results[0] is None:
+                raise ValueError("Failed to retrieve comparison results.")
+            _, original_time, _, optimized_time, results_match = comparison_results
+            outcome.update(
+                status='validated',
+                original_time=original_time,
+                optimized_time=optimized_time,
+                results_match=results_match,
+            )
+            get_run_store().record_run(query_text, checked_query, optimized_query, original_time, optimized_time,
+                                       results_match, "server", model or UNKNOWN_MODEL)
+            get_model_router().record_verification(model, results_match)
+    except Exception as e:
+        logger.error(f"Batch optimization failed: {str(e)}")
+        outcome.update(status='failed', error=str(e))
+    return outcome
+
+
+# Function to optimize a batch of queries with a bounded worker pool, reporting progress per finished query
+def run_batch(queries: pd.DataFrame, workers: int = DEFAULT_WORKERS, validate: bool = True,
+              on_progress: Optional[Callable[[pd.DataFrame], None]] = None, plan_first: bool = False,
+              sample_percent: Optional[float] = None) -> pd.DataFrame:
+    progress = pd.DataFrame({
+        'parameterized_hash': queries['query_parameterized_hash'],
+        'executions': queries['executions'],
+        'total_elapsed_s': queries['total_elapsed_time'],
+        'credits': queries['total_credits'],
+        'status': 'queued',
+    }).reindex(columns=PROGRESS_COLUMNS).astype(object)
+    if on_progress:
+        on_progress(progress)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(optimize_one, query_text, validate, plan_first, sample_percent): index
+            for index, query_text in queries['query_text'].items()
+        }
+        for future in as_completed(futures):
+            for column, value in future.result().items():
+                progress.at[futures[future], column] = value
+            if on_progress:
+                on_progress(progress)
+    return progress
+
+
+# Streamlit page for batch optimization
+def main():
+    st.title("Batch Optimization of Expensive Queries")
+
+    top_n = st.number_input("Number of queries:", min_value=1, max_value=500, value=DEFAULT_TOP_N)
+    days = st.number_input("Look back (days):", min_value=1, max_value=365, value=DEFAULT_DAYS)
+    ranking = st.selectbox("Rank by:", RANKINGS)
+    workers = st.slider("Parallel workers:", min_value=1, max_value=16, value=DEFAULT_WORKERS)
+    validate = st.checkbox("Validate by executing original and optimized queries", value=True)
+    plan_first = st.checkbox("Estimate with EXPLAIN first (execute only when the plans are too close to call)", disabled=not validate)
+    sampled = st.checkbox("Validate on a sample of the tables instead of the full tables", disabled=not validate)
+    sample_percent = st.slider("Sample size (% of rows):", min_value=0.1, max_value=10.0, value=DEFAULT_SAMPLE_PERCENT, step=0.1, disabled=not sampled)
+
+    if st.button("Run Batch"):
+        try:
+            with st.spinner("Fetching expensive queries..."):
+                queries = fetch_expensive_queries(top_n, days, ranking)
+            if queries.empty:
+                st.warning("No matching queries found in the history.")
+                return
+            st.write(f"Optimizing {len(queries)} distinct queries...")
+            table = st.empty()
+            start_time = time.perf_counter()
+            progress = run_batch(queries, workers, validate, on_progress=table.dataframe, plan_first=plan_first,
+                                 sample_percent=sample_percent if sampled else None)
+            st.success(f"Batch finished in {time.perf_counter() - start_time:.1f} seconds.")
+            st.session_state.batch_results = progress
+        except Exception as e:
+            logger.error(f"An error occurred: {str(e)}")
+            st.error(f"An error occurred: {str(e)}")
+
+    if st.session_state.get('batch_results') is not None:
+        st.download_button(
+            "Download results (CSV)",
+            st.session_state.batch_results.to_csv(index=False),
+            file_name="batch_optimization.csv",
+        )
+
+
+# Command line entry point: python Batch.py --top 50 --workers 8
+def cli(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Optimize the most expensive queries from QUERY_HISTORY.")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_N)
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS)
+    parser.add_argument("--rank-by", choices=RANKINGS, default="elapsed")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--no-validate", action="store_true", help="Skip executing the queries to validate rewrites.")
+    parser.add_argument("--plan-first", action="store_true", help="Compare EXPLAIN plans and only execute when they are too close to call.")
+    parser.add_argument("--sample-percent", type=float, help="Validate on this percentage of each table's rows instead of the full tables.")
+    parser.add_argument("--output", help="Write the results table to this CSV file.")
+    args = parser.parse_args(argv)
+
+    queries = fetch_expensive_queries(args.top, args.days, args.rank_by)
+
+    def print_progress(progress: pd.DataFrame):
+        counts = progress['status'].value_counts().to_dict()
+        print(", ".join(f"{status}: {count}" for status, count in sorted(counts.items())), flush=True)
+
+    progress = run_batch(queries, args.workers, not args.no_validate, on_progress=print_progress, plan_first=args.plan_first,
+                         sample_percent=args.sample_percent)
+    print(progress.drop(columns=['optimized_query']).to_string(index=False))
+    if args.output:
+        progress.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    if st.runtime.exists():
+        main()
+    else:
+        cli()
@@ -0,0 +1,63 @@
+import argparse
+import hashlib
+import time
+
+import numpy as np
+import pandas as pd
+
+from Hashing import hash_rows
+
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+# The row-wise MD5 path takes minutes beyond this size, so it is skipped unless asked for
+DEFAULT_LEGACY_MAX_ROWS = 1_000_000
+
+
+# Previous implementation: one comma-joined string and one MD5 per row via DataFrame.apply
+def legacy_hash_row(row):
+    row_string = ','.join(map(str, row))
+    return hashlib.md5(row_string.encode()).hexdigest()
+
+
+def legacy_hash_rows(df: pd.DataFrame) -> pd.Series:
+    return df.apply(legacy_hash_row, axis=1)
+
+
+# Function to build a mixed-type result set resembling a typical query output
+def make_frame(rows: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    ids = rng.integers(0, 1_000_000_000, rows)
+    amounts = rng.normal(100.0, 25.0, rows)
+    amounts[rng.random(rows) < 0.05] = np.nan
+    return pd.DataFrame({
+        'ID': ids,
+        'AMOUNT': amounts,
+        'REGION': pd.Series(rng.choice(['EMEA', 'APAC', 'AMER', None], rows), dtype=object),
+        'CREATED_AT': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 86400 * 365, rows), unit='s'),
+    })
+
+
+def time_call(func, df: pd.DataFrame) -> float:
+    start_time = time.perf_counter()
+    func(df)
+    return time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark row hashing: row-wise MD5 vs vectorized hash_rows.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--legacy-max-rows", type=int, default=DEFAULT_LEGACY_MAX_ROWS)
+    args = parser.parse_args()
+
+    print(f"{'rows':>12} {'legacy (s)':>12} {'vectorized (s)':>15} {'speedup':>9}")
+    for rows in args.sizes:
+        df = make_frame(rows)
+        vectorized = time_call(hash_rows, df)
+        if rows <= args.legacy_max_rows:
+            legacy = time_call(legacy_hash_rows, df)
+            print(f"{rows:>12,} {legacy:>12.3f} {vectorized:>15.3f} {legacy / vectorized:>8.1f}x")
+        else:
+            print(f"{rows:>12,} {'skipped':>12} {vectorized:>15.3f} {'-':>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import logging
+import math
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from History import get_query_stats_batch
+
+logger = logging.getLogger(__name__)
+
+# Benchmark defaults
+DEFAULT_TRIALS = 10
+DEFAULT_WARMUPS = 1
+DEFAULT_BOOTSTRAP_SAMPLES = 2000
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_ALPHA = 0.05
+
+# Per-run timings collected from query history, in seconds
+TIMING_COLUMNS = ['compilation_time', 'execution_time', 'queued_time', 'server_time']
+# Timing the verdict is based on: compilation + execution, leaving out warehouse queueing
+DECISION_COLUMN = 'server_time'
+
+VARIANTS = ("original", "optimized")
+
+
+@dataclass
+class BenchmarkResult:
+    trials: pd.DataFrame  # One row per measured run: variant, trial, query_id and TIMING_COLUMNS
+    summary: pd.DataFrame  # Median and p95 of each timing, per variant
+    speedup: float  # Median original / median optimized server time
+    confidence_interval: Tuple[float, float]  # Bootstrap interval of the speedup
+    p_value: float  # Two-sided Mann-Whitney U test on server time
+    verdict: str  # "faster", "slower" or "no significant difference"
+
+
+# Function to compute the two-sided Mann-Whitney U test (normal approximation with tie and continuity correction)
+def mann_whitney_u(x, y) -> Tuple[float, float]:
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    n1, n2 = len(x), len(y)
+    n = n1 + n2
+    ranks = pd.Series(np.concatenate([x, y])).rank(method='average').to_numpy()
+    u = ranks[:n1].sum() - n1 * (n1 + 1) / 2
+    mean = n1 * n2 / 2
+    _, tie_counts = np.unique(np.concatenate([x, y]), return_counts=True)
+    tie_term = (tie_counts ** 3 - tie_counts).sum() / (n * (n - 1)) if n > 1 else 0.0
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term)
+    if variance <= 0:
+        return float(u), 1.0  # Every value is identical
+    z = (abs(u - mean) - 0.5) / math.sqrt(variance)
+    return float(u), min(1.0, math.erfc(max(z, 0.0) / math.sqrt(2)))
+
+
+# Function to bootstrap a confidence interval for the ratio of medians (original / optimized)
+def bootstrap_speedup_ci(original, optimized, samples: int = DEFAULT_BOOTSTRAP_SAMPLES,
+                         confidence: float = DEFAULT_CONFIDENCE, seed: int = 0) -> Tuple[float, float]:
+    rng = np.random.default_rng(seed)
+    original, optimized = np.asarray(original, dtype=float), np.asarray(optimized, dtype=float)
+    original_medians = np.median(rng.choice(original, (samples, len(original))), axis=1)
+    optimized_medians = np.median(rng.choice(optimized, (samples, len(optimized))), axis=1)
+    ratios = original_medians / np.maximum(optimized_medians, 1e-9)
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(ratios, [tail, 100 - tail])
+    return float(low), float(high)
+
+
+def _run(cursor, query: str) -> Optional[str]:
+    # The result stays on the server; only the server-side timings are of interest
+    cursor.execute(query)
+    return getattr(cursor, "sfqid", None)
+
+
+# Function to time the original and optimized query over interleaved trials on one connection
+# The result cache is disabled for the session while benchmarking and restored afterwards
+def benchmark_queries(get_connection: Callable, original_query: str, optimized_query: str,
+                      trials: int = DEFAULT_TRIALS, warmups: int = DEFAULT_WARMUPS,
+                      alpha: float = DEFAULT_ALPHA, seed: int = 0) -> BenchmarkResult:
+    queries = dict(zip(VARIANTS, [original_query, optimized_query]))
+    runs = []
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("ALTER SESSION SET USE_CACHED_RESULT = FALSE")
+            try:
+                # Warm the warehouse cache for both queries so the first trial is not penalised
+                for _ in range(warmups):
+                    for variant in VARIANTS:
+                        _run(cursor, queries[variant])
+                # Alternate the order every trial so drift in warehouse load affects both variants alike
+                for trial in range(trials):
+                    order = VARIANTS if trial % 2 == 0 else VARIANTS[::-1]
+                    for variant in order:
+                        runs.append({'variant': variant, 'trial': trial, 'query_id': _run(cursor, queries[variant])})
+            finally:
+                cursor.execute("ALTER SESSION UNSET USE_CACHED_RESULT")
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+    logger.info(f"Benchmark ran {len(runs)} measured queries; fetching their timings.")
+
+    query_stats = get_query_stats_batch(get_connection, [run['query_id'] for run in runs])
+    for run in runs:
+        stats = query_stats.get(run['query_id'], {})
+        for column in ('compilation_time', 'execution_time', 'queued_time'):
+            run[column] = stats.get(column)
+    trials_frame = pd.DataFrame(runs).dropna(subset=['compilation_time', 'execution_time'])
+    if trials_frame.empty:
+        raise ValueError("No query history found for the benchmark runs.")
+    trials_frame['server_time'] = trials_frame['compilation_time'] + trials_frame['execution_time']
+    return summarize_trials(trials_frame, alpha=alpha, seed=seed)
+
+
+# Function to turn per-run timings into medians, p95, a speedup interval and a significance verdict
+def summarize_trials(trials: pd.DataFrame, alpha: float = DEFAULT_ALPHA, seed: int = 0) -> BenchmarkResult:
+    grouped = trials.groupby('variant')[TIMING_COLUMNS]
+    summary = pd.concat({'median': grouped.median(), 'p95': grouped.quantile(0.95)}, axis=1).reindex(list(VARIANTS))
+
+    samples: Dict[str, np.ndarray] = {
+        variant: trials.loc[trials['variant'] == variant, DECISION_COLUMN].to_numpy(dtype=float)
+        for variant in VARIANTS
+    }
+    if any(len(values) == 0 for values in samples.values()):
+        raise ValueError("Both variants need at least one measured run.")
+    speedup = float(np.median(samples['original']) / max(np.median(samples['optimized']), 1e-9))
+    confidence_interval = bootstrap_speedup_ci(samples['original'], samples['optimized'], seed=seed)
+    _, p_value = mann_whitney_u(samples['original'], samples['optimized'])
+
+    if p_value < alpha and confidence_interval[0] > 1:
+        verdict = "faster"
+    elif p_value < alpha and confidence_interval[1] < 1:
+        verdict = "slower"
+    else:
+        verdict = "no significant difference"
+    logger.info(f"Benchmark verdict: {verdict} (speedup {speedup:.2f}x, p={p_value:.3f})")
+    return BenchmarkResult(trials, summary, speedup, confidence_interval, p_value, verdict)
@@ -0,0 +1,213 @@
+import json
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import streamlit as st
+
+from Fetch import read_arrow
+
+logger = logging.getLogger(__name__)
+
+# Chat defaults
+DEFAULT_LIVE_MESSAGES = 20  # Most recent messages rendered as chat bubbles on every rerun
+DEFAULT_PAGE_SIZE = 20  # Older messages shown per page when the history is expanded
+DEFAULT_MAX_MESSAGES = 500  # Messages kept per session; the oldest are dropped beyond this
+DEFAULT_MAX_CHARS = 200_000  # Characters kept per session across all messages
+
+# Context budget defaults for Cortex chat completions
+DEFAULT_PROMPT_TOKEN_BUDGET = 3000  # Prompt tokens per turn: system message, summary and recent turns
+DEFAULT_MAX_RESPONSE_TOKENS = 1024
+DEFAULT_SUMMARY_TOKENS = 300
+SUMMARY_BATCH_MESSAGES = 6  # Turns are folded into the summary at least this many at a time
+CHARS_PER_TOKEN = 4  # Rough estimate for English text
+
+# Chat completion over a messages array; model, messages and options are bound as parameters
+CHAT_COMPLETE_SQL = "SELECT SNOWFLAKE.CORTEX.COMPLETE(?, PARSE_JSON(?)::ARRAY, PARSE_JSON(?)::OBJECT) AS response;"
+SUMMARY_SYSTEM_MESSAGE = (
+    "Summarize the conversation below for your own future reference. Keep names, numbers, decisions and "
+    "open questions; drop pleasantries. Reply with the summary only."
+)
+
+
+class ChatHistory:
+    """Bounded per-session chat history, stored as compact (role, content) tuples."""
+
+    def __init__(self, max_messages: int = DEFAULT_MAX_MESSAGES, max_chars: int = DEFAULT_MAX_CHARS):
+        self.max_chars = max_chars
+        self._messages = deque(maxlen=max_messages)
+        self._chars = 0
+        self.dropped = 0  # Messages evicted to stay within the limits
+        self.summary = ""  # Rolling summary of older turns, sent in place of them
+        self.summarized_upto = 0  # Messages (counted from the start of the session) folded into the summary
+
+    def append(self, role: str, content: str):
+        if len(self._messages) == self._messages.maxlen:
+            self._evict()
+        self._messages.append((role, content))
+        self._chars += len(content)
+        while self._chars > self.max_chars and len(self._messages) > 1:
+            self._evict()
+
+    def _evict(self):
+        _, content = self._messages.popleft()
+        self._chars -= len(content)
+        self.dropped += 1
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        return iter(self._messages)
+
+    def recent(self, count: int) -> List[Tuple[str, str]]:
+        start = max(len(self._messages) - count, 0)
+        return [self._messages[i] for i in range(start, len(self._messages))]
+
+    # Older messages (everything before the live window) are paged newest page first
+    def older_page_count(self, live_messages: int, page_size: int) -> int:
+        older = max(len(self._messages) - live_messages, 0)
+        return -(-older // page_size)
+
+    def older_page(self, page: int, live_messages: int, page_size: int) -> List[Tuple[str, str]]:
+        end = max(len(self._messages) - live_messages - page * page_size, 0)
+        start = max(end - page_size, 0)
+        return [self._messages[i] for i in range(start, end)]
+
+    # Messages from the given position onwards (counted from the start of the session), with their positions
+    def messages_since(self, position: int) -> List[Tuple[int, str, str]]:
+        first = self.dropped
+        return [(first + i, role, content) for i, (role, content) in enumerate(self._messages) if first + i >= position]
+
+    def as_dicts(self) -> List[dict]:
+        return [{'role': role, 'content': content} for role, content in self._messages]
+
+    def clear(self):
+        self._messages.clear()
+        self._chars = 0
+        self.dropped = 0
+        self.summary = ""
+        self.summarized_upto = 0
+
+
+# Function to get this session's chat history, converting a plain list left by an older version of the page
+def get_chat_history(key: str = "messages") -> ChatHistory:
+    history = st.session_state.get(key)
+    if not isinstance(history, ChatHistory):
+        legacy_messages = history or []
+        history = ChatHistory()
+        for message in legacy_messages:
+            history.append(message["role"], message["content"])
+        st.session_state[key] = history
+    return history
+
+
+# Function to render the chat: the last `live_messages` as chat bubbles, older ones only on request, one page at a time
+def render_chat(history: ChatHistory, live_messages: int = DEFAULT_LIVE_MESSAGES, page_size: int = DEFAULT_PAGE_SIZE):
+    page_count = history.older_page_count(live_messages, page_size)
+    if page_count or history.dropped:
+        older = len(history) - min(len(history), live_messages)
+        with st.expander(f"Earlier messages ({older})"):
+            if history.dropped:
+                st.caption(f"{history.dropped} older messages are no longer kept in this session.")
+            # Nothing is rendered until asked for, so long histories cost nothing on reruns
+            if page_count and st.checkbox("Show earlier messages", key="chat_show_earlier"):
+                page = st.number_input("Page (1 = most recent):", min_value=1, max_value=page_count, value=1, key="chat_page")
+                for role, content in history.older_page(page - 1, live_messages, page_size):
+                    st.markdown(f"**{role.capitalize()}:** {content}")
+
+    for role, content in history.recent(live_messages):
+        with st.chat_message(role):
+            st.markdown(content)
+
+
+@dataclass
+class ChatReply:
+    text: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+# Function to run one Cortex chat completion; payload is the JSON messages array
+def run_cortex_chat(get_connection: Callable, payload: str, model: str,
+                    max_tokens: int = DEFAULT_MAX_RESPONSE_TOKENS) -> str:
+    conn = get_connection()
+    try:
+        result = read_arrow(CHAT_COMPLETE_SQL, conn, params=(model, payload, json.dumps({'max_tokens': max_tokens})))
+    finally:
+        conn.close()
+    return result.iloc[0, 0]
+
+
+# Function to read the text and token usage out of a COMPLETE response (JSON when options are passed)
+def parse_chat_response(response: str) -> ChatReply:
+    try:
+        document = json.loads(response)
+    except (TypeError, ValueError):
+        return ChatReply(str(response))
+    usage = document.get('usage', {})
+    choice = (document.get('choices') or [{}])[0]
+    return ChatReply(choice.get('messages', ''), usage.get('prompt_tokens'), usage.get('completion_tokens'))
+
+
+# Function to build the prompt: system message, rolling summary, then as many recent turns as fit the budget
+# Returns the messages and the older turns that no longer fit
+def build_chat_messages(history: ChatHistory, system_message: str,
+                        budget: int = DEFAULT_PROMPT_TOKEN_BUDGET) -> Tuple[List[dict], List[Tuple[int, str, str]]]:
+    messages = [{'role': 'system', 'content': system_message}]
+    if history.summary:
+        messages.append({'role': 'system', 'content': f"Summary of the earlier conversation: {history.summary}"})
+    remaining = budget - sum(estimate_tokens(message['content']) for message in messages)
+
+    pending = history.messages_since(history.summarized_upto)
+    window = []
+    for position, role, content in reversed(pending):
+        tokens = estimate_tokens(content)
+        if tokens > remaining:
+            if not window:
+                # The latest message alone is over budget: keep its most recent part
+                window.append((position, role, content[-max(remaining, 1) * CHARS_PER_TOKEN:]))
+            break
+        window.append((position, role, content))
+        remaining -= tokens
+    window.reverse()
+    messages.extend({'role': role, 'content': content} for _, role, content in window)
+    return messages, pending[:len(pending) - len(window)]
+
+
+# Function to fold turns that fell out of the window into the rolling summary
+def summarize_turns(history: ChatHistory, turns: List[Tuple[int, str, str]], complete: Callable[[str], str]):
+    transcript = "\n".join(f"{role}: {content}" for _, role, content in turns)
+    if history.summary:
+        transcript = f"Earlier summary: {history.summary}\n{transcript}"
+    messages = [
+        {'role': 'system', 'content': SUMMARY_SYSTEM_MESSAGE},
+        {'role': 'user', 'content': transcript[-DEFAULT_PROMPT_TOKEN_BUDGET * CHARS_PER_TOKEN:]},
+    ]
+    reply = parse_chat_response(complete(json.dumps(messages)))
+    history.summary = reply.text.strip()[:DEFAULT_SUMMARY_TOKENS * CHARS_PER_TOKEN]
+    history.summarized_upto = turns[-1][0] + 1
+    logger.info(f"Folded {len(turns)} turns into the conversation summary.")
+
+
+# Function to answer the latest user message with the conversation as context, within the token budget
+# complete(payload) runs one completion of a JSON messages array and returns the raw response
+def chat_turn(history: ChatHistory, system_message: str, complete: Callable[[str], str],
+              budget: int = DEFAULT_PROMPT_TOKEN_BUDGET) -> ChatReply:
+    messages, overflow = build_chat_messages(history, system_message, budget)
+    while overflow:
+        # Every turn that no longer fits is folded in, so none is left out of both the prompt and the summary.
+        # A full batch is folded even when fewer turns overflow, taking the oldest turns that still fit too,
+        # so the summary is rewritten once every few turns rather than on every one. The latest message stays.
+        pending = history.messages_since(history.summarized_upto)
+        batch_size = max(len(overflow), min(SUMMARY_BATCH_MESSAGES, len(pending) - 1))
+        summarize_turns(history, pending[:batch_size], complete)
+        messages, overflow = build_chat_messages(history, system_message, budget)
+    reply = parse_chat_response(complete(json.dumps(messages)))
+    logger.info(f"Chat turn: {len(messages)} messages, {reply.prompt_tokens} prompt tokens.")
+    return reply
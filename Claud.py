@@ -1,13 +1,36 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import snowflake.connector
 import logging
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
+from Pool import SnowflakeConnectionPool, DEFAULT_MIN_SIZE, DEFAULT_MAX_SIZE, DEFAULT_IDLE_TIMEOUT
+from Cache import ResponseCache, DEFAULT_CACHE_PATH, DEFAULT_TTL
+from Fetch import read_arrow
+from RunStore import RunStore, DEFAULT_RUN_STORE_PATH, UNKNOWN_MODEL
+from Cortex import AsyncCortexClient, DEFAULT_MAX_CONCURRENCY, DEFAULT_RATE_PER_SECOND, DEFAULT_TIMEOUT, iter_text_chunks, stream_complete
+from Lint import lint_query
+from Rewrite import build_optimize_prompt, rewrite_query
+from Chat import run_cortex_chat
+from Router import DEFAULT_LEDGER_PATH, DEFAULT_RACE_MODELS, ModelLedger, ModelRouter, response_has_valid_sql
+from Executor import run_query, execute_queries_concurrently
+from History import get_query_stats, get_query_stats_batch
+from Compare import RESULT_SCAN_SQL, query_results_equal, server_results_equal
+from Extraction import FenceParser, extract_sql, tee_to_parser
+from Explain import compare_query_plans
+from Benchmark import DEFAULT_TRIALS, benchmark_queries
+from Sample import DEFAULT_SAMPLE_PERCENT, SAMPLE_MODES, sample_speedup, validate_on_sample
+from Jobs import DEFAULT_POLL_INTERVAL, get_job_queue, job_status_message
+from Hashing import hash_rows
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Default Cortex model; the model router picks the model for each task
+CORTEX_MODEL = 'snowflake-arctic'
+
 # Prompts
 system_message = """
     You are a helpful assistant for analyzing and optimizing queries running on Snowflake to reduce resource consumption and improve performance.
@@ -23,27 +46,157 @@ system_message = """
     5. Prepare Summary
 """
 
-# Define Snowflake connection (Already handled by the user)
-def get_snowflake_connection():
+# Open a raw Snowflake connection (used by the pool only)
+def connect_snowflake():
     conn = snowflake.connector.connect(
         account=st.secrets["snowflake"]["account"],
         user=st.secrets["snowflake"]["user"],
         password=st.secrets["snowflake"]["password"],
         warehouse=st.secrets["snowflake"]["warehouse"],
         database=st.secrets["snowflake"]["database"],
-        schema=st.secrets["snowflake"]["schema"]
+        schema=st.secrets["snowflake"]["schema"],
+        # Bind parameters server-side, so statement text stays stable and compiled plans can be reused
+        paramstyle="qmark"
     )
     return conn
 
-# Function to use Snowflake Cortex for inference
-def cortex_inference(prompt: str) -> str:
-    logger.info(f"Sending prompt to Snowflake Cortex: {prompt}")
-    query = f"SELECT SNOWFLAKE.CORTEX.COMPLETE('snowflake-arctic', '{prompt}');"
+# Connection pool shared by every session of this Streamlit server
+@st.cache_resource
+def get_connection_pool() -> SnowflakeConnectionPool:
+    pool_settings = st.secrets.get("snowflake_pool", {})
+    return SnowflakeConnectionPool(
+        connect=connect_snowflake,
+        min_size=pool_settings.get("min_size", DEFAULT_MIN_SIZE),
+        max_size=pool_settings.get("max_size", DEFAULT_MAX_SIZE),
+        idle_timeout=pool_settings.get("idle_timeout", DEFAULT_IDLE_TIMEOUT),
+    )
+
+# Define Snowflake connection (Already handled by the user)
+# Connections come from the pool; conn.close() hands them back instead of closing them
+def get_snowflake_connection():
+    return get_connection_pool().acquire()
+
+# Completion cache shared by every session of this Streamlit server
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    cache_settings = st.secrets.get("cortex_cache", {})
+    return ResponseCache(
+        path=cache_settings.get("path", DEFAULT_CACHE_PATH),
+        ttl=cache_settings.get("ttl", DEFAULT_TTL),
+    )
+
+# Store of optimization runs shared by every session, so verified results are reused across the team
+@st.cache_resource
+def get_run_store() -> RunStore:
+    store_settings = st.secrets.get("run_store", {})
+    return RunStore(path=store_settings.get("path", DEFAULT_RUN_STORE_PATH))
+
+# Function to run a single Cortex completion (no caching or retries)
+def run_cortex_complete(prompt: str, model: str) -> str:
+    query = "SELECT SNOWFLAKE.CORTEX.COMPLETE(?, ?);"
     conn = get_snowflake_connection()
-    result = pd.read_sql(query, conn)
-    conn.close()
+    try:
+        result = read_arrow(query, conn, params=(model, prompt))
+    finally:
+        conn.close()
     return result.iloc[0, 0]
 
+# Cortex client shared by every session, so concurrency and rate limits hold server-wide
+@st.cache_resource
+def get_cortex_client() -> AsyncCortexClient:
+    client_settings = st.secrets.get("cortex_client", {})
+    return AsyncCortexClient(
+        run_cortex_complete,
+        max_concurrency=client_settings.get("max_concurrency", DEFAULT_MAX_CONCURRENCY),
+        rate_per_second=client_settings.get("rate_per_second", DEFAULT_RATE_PER_SECOND),
+        timeout=client_settings.get("timeout", DEFAULT_TIMEOUT),
+    )
+
+# Function to run one chat completion of a JSON messages array through the shared Cortex client,
+# so chat pages and the optimizer draw on the same concurrency and rate limits
+def cortex_chat_complete(payload: str, model: str = CORTEX_MODEL) -> str:
+    return get_cortex_client().complete_sync(
+        payload,
+        model,
+        complete_fn=lambda payload, model: run_cortex_chat(get_snowflake_connection, payload, model)
+    )
+
+# Model router shared by every session, so the latency/quality ledger covers all traffic
+@st.cache_resource
+def get_model_router() -> ModelRouter:
+    router_settings = st.secrets.get("model_router", {})
+    return ModelRouter(
+        task_models=dict(router_settings.get("task_models", {})),
+        race_models=router_settings.get("race_models", DEFAULT_RACE_MODELS),
+        race_tasks=router_settings.get("race_tasks", ()),
+        ledger=ModelLedger(path=router_settings.get("ledger_path", DEFAULT_LEDGER_PATH)),
+        adaptive=router_settings.get("adaptive", False),
+    )
+
+# Function to run a completion for a task ("check" or "optimize") on the model(s) the router picks
+# Raced tasks go to several models at once and take the first answer with valid SQL; returns (model, response)
+def route_completion(prompt: str, task: str) -> tuple:
+    router = get_model_router()
+    models = router.models_for(task)
+    cache = get_response_cache()
+    for model in models:
+        cached_response = cache.get(model, '', prompt)
+        if cached_response is not None:
+            logger.info(f"Returning cached Cortex response ({model}).")
+            return model, cached_response
+
+    logger.info(f"Sending prompt to Snowflake Cortex ({', '.join(models)}): {prompt}")
+    if len(models) > 1:
+        def record_attempt(model, response, error, latency, accepted):
+            if error is None:
+                router.record_call(model, task, latency, accepted, won=accepted)
+        model, response = get_cortex_client().race_sync(prompt, models, accept=response_has_valid_sql, on_result=record_attempt)
+        logger.info(f"{model} won the race.")
+    else:
+        model = models[0]
+        started = time.monotonic()
+        response = get_cortex_client().complete_sync(prompt, model)
+        router.record_call(model, task, time.monotonic() - started, response_has_valid_sql(response))
+    cache.put(model, '', prompt, response)
+    return model, response
+
+# Function to use Snowflake Cortex for inference
+def cortex_inference(prompt: str, task: str = "optimize") -> str:
+    return route_completion(prompt, task)[1]
+
+# Function to stream a Cortex completion, yielding text as soon as it is generated
+# Falls back to a full (cached, retried) completion replayed in chunks when streaming is unavailable
+def stream_cortex_inference(prompt: str, model: str = CORTEX_MODEL, task: str = "optimize"):
+    cache = get_response_cache()
+    cached_response = cache.get(model, '', prompt)
+    if cached_response is not None:
+        logger.info("Returning cached Cortex response.")
+        yield cached_response
+        return
+
+    logger.info(f"Streaming prompt to Snowflake Cortex ({model}): {prompt}")
+    chunks = []
+    started = time.monotonic()
+    try:
+        conn = get_snowflake_connection()
+        try:
+            host, token = conn.host, conn.rest.token
+        finally:
+            conn.close()
+        for chunk in stream_complete(host, token, prompt, model):
+            chunks.append(chunk)
+            yield chunk
+    except Exception as e:
+        if chunks:
+            raise
+        # The fallback stays on the same model, so the completion is attributed correctly
+        logger.warning(f"Streaming unavailable ({str(e)}); falling back to a full completion.")
+        chunks = [get_cortex_client().complete_sync(prompt, model)]
+        yield from iter_text_chunks(chunks[0])
+    response = "".join(chunks)
+    get_model_router().record_call(model, task, time.monotonic() - started, response_has_valid_sql(response))
+    cache.put(model, '', prompt, response)
+
 # Query SQL Checker Tool
 def query_sql_checker_tool(query: str) -> str:
     prompt = f"""
@@ -59,228 +212,138 @@ def query_sql_checker_tool(query: str) -> str:
     - Using the proper columns for joins
     If there are any mistakes, rewrite the query. Output the final SQL query only.
     """
-    logger.info("Running SQL checker for common mistakes.")
-    return cortex_inference(prompt)
-
-# Function to get query execution time from Snowflake
-def get_execution_time(query: str) -> float:
-    logger.info("Fetching execution time from Snowflake.")
-    conn = get_snowflake_connection()
-    query_history = f"""
-        SELECT query_id, execution_time
-        FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
-        WHERE query_text = '{query}' 
-        AND query_start_time >= DATEADD(day, -7, CURRENT_TIMESTAMP())
-        ORDER BY query_start_time DESC
-        LIMIT 1;
+    # A clean local lint skips the Cortex round trip; otherwise the findings are passed along
+    report = lint_query(query)
+    if not report.needs_llm_check:
+        logger.info("Local lint found no issues; skipping the Cortex SQL checker.")
+        return query
+    prompt += f"""
+    A local static check reported:
+{report.describe()}
     """
-    result = pd.read_sql(query_history, conn)
-    conn.close()
-    if result.empty:
-        logger.error("No matching query found in the history.")
-        raise ValueError("No matching query found in the history.")
-    execution_time = result['execution_time'].iloc[0] / 1000  # Convert to seconds
-    logger.info(f"Execution time retrieved: {execution_time} seconds")
-    return execution_time
+    logger.info("Running SQL checker for common mistakes.")
+    return cortex_inference(prompt, task="check")
 
 # Optimizing the SQL Query with Snowflake Cortex
 def optimize_query(query: str) -> str:
-    prompt = f"Optimize the following query: {query}"
+    prompt = build_optimize_prompt(query)
     logger.info("Optimizing the SQL query using Cortex.")
-    optimized_query = cortex_inference(prompt)
+    optimized_query = cortex_inference(prompt, task="optimize")
     return optimized_query
 
-# Function to remove all single inverted commas (') from the query
-def remove_single_quotes(query: str) -> str:
-    logger.info("Removing single inverted commas from the query.")
-    return query.replace("'", "")
-
-# Function to compare and execute queries
-def compare_and_execute_queries(original_query: str, optimized_query: str) -> tuple:
-    logger.info("Comparing and executing queries.")
-    
-    # Get execution time for original query
-    original_execution_time = get_execution_time(original_query)
-    
-    # Execute optimized query
-    conn = get_snowflake_connection()
-    start_time = datetime.now()
-    optimized_result = pd.read_sql(optimized_query, conn)
-    end_time = datetime.now()
-    conn.close()
-    
-    optimized_execution_time = (end_time - start_time).total_seconds()
-    
-    # Compare results
-    original_result = pd.read_sql(original_query, get_snowflake_connection())
-    results_match = original_result.equals(optimized_result)
-    
-    return original_query, original_execution_time, optimized_query, optimized_execution_time, results_match
+# Streaming variant of optimize_query, for rendering the completion as it arrives
+def stream_optimize_query(query: str, model: str = CORTEX_MODEL):
+    prompt = build_optimize_prompt(query)
+    logger.info("Optimizing the SQL query using Cortex (streaming).")
+    yield from stream_cortex_inference(prompt, model, task="optimize")
 
-# Streamlit application for SQL optimization
-def main():
-    st.title("Snowflake SQL Optimizer with Cortex")
-
-    # Initialize session state variables if not present
-    if 'sql_query' not in st.session_state:
-        st.session_state.sql_query = ''
-    if 'checked_query' not in st.session_state:
-        st.session_state.checked_query = ''
-    if 'optimized_query' not in st.session_state:
-        st.session_state.optimized_query = ''
-    if 'comparison_results' not in st.session_state:
-        st.session_state.comparison_results = None
-
-    # Inputs from the user
-    sql_query = st.text_area("Enter your SQL query:", value=st.session_state.sql_query)
-
-    if st.button("Optimize Query"):
-        if not sql_query:
-            st.error("Please enter a SQL query.")
-            return
-
-        # Save SQL query in session state
-        st.session_state.sql_query = sql_query
-
-        # Show progress in UI
-        with st.spinner("Processing..."):
-            try:
-                logger.info(f"User-provided SQL query: {sql_query}")
-
-                # Step 1: Check the SQL query for errors using Cortex
-                st.write("Checking SQL query for common mistakes...")
-                st.session_state.checked_query = query_sql_checker_tool(sql_query)
-                st.write("Checked SQL Query for common mistakes:")
-                st.code(st.session_state.checked_query)
-
-                # Step 2: Optimize the SQL query
-                st.write("Optimizing the SQL query...")
-                st.session_state.optimized_query = optimize_query(st.session_state.checked_query)
-                st.write("Optimized SQL Query:")
-                st.code(st.session_state.optimized_query)
-
-            except Exception as e:
-                logger.error(f"An error occurred: {str(e)}")
-                st.error(f"An error occurred: {str(e)}")
-
-    # Step 3: Run Optimized Query
-    if st.session_state.optimized_query:
-        if st.button("Run Optimized Query"):
-            try:
-                # Step 4: Remove single quotes from optimized query
-                optimized_query_no_quotes = remove_single_quotes(st.session_state.optimized_query)
-                st.write("Optimized SQL Query (without single quotes):")
-                st.code(optimized_query_no_quotes)
-
-                # Step 5: Compare and execute queries
-                st.write("Comparing and executing queries...")
-                original_query, original_time, optimized_query, optimized_time, results_match = compare_and_execute_queries(
-                    st.session_state.sql_query,
-                    optimized_query_no_quotes
-                )
-
-                # Store results in session state
-                st.session_state.comparison_results = {
-                    'original_query': original_query,
-                    'original_time': original_time,
-                    'optimized_query': optimized_query,
-                    'optimized_time': optimized_time,
-                    'results_match': results_match
-                }
-
-            except Exception as e:
-                logger.error(f"An error occurred: {str(e)}")
-                st.error(f"An error occurred: {str(e)}")
-
-    # Display comparison results if available
-    if st.session_state.comparison_results:
-        st.write("Comparison Results:")
-        st.write(f"Original Query Execution Time: {st.session_state.comparison_results['original_time']} seconds")
-        st.write(f"Optimized Query Execution Time: {st.session_state.comparison_results['optimized_time']} seconds")
-        
-        if st.session_state.comparison_results['results_match']:
-            st.success("The results of both queries match.")
-        else:
-            st.warning("The results of the queries do not match.")
-
-        if st.session_state.comparison_results['optimized_time'] < st.session_state.comparison_results['original_time']:
-            st.success("The optimized query is faster!")
-        else:
-            st.warning("The optimized query is slower or has no improvement.")
-
-if __name__ == "__main__":
-    main()
-
-
-
-
-
-
-
-import streamlit as st
-import pandas as pd
-import snowflake.connector
-import logging
-from datetime import datetime, timedelta
-import time
-
-# ... (keep the existing imports and logging setup)
-
-def get_snowflake_connection():
-    # ... (keep the existing connection function)
-
-def get_execution_time(query: str) -> float:
-    logger.info("Fetching execution time from Snowflake.")
-    conn = get_snowflake_connection()
-    query_history = f"""
-        SELECT query_id, execution_time
-        FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
-        WHERE query_text = '{query}' 
-        AND query_start_time >= DATEADD(day, -7, CURRENT_TIMESTAMP())
-        ORDER BY query_start_time DESC
-        LIMIT 1;
-    """
-    result = pd.read_sql(query_history, conn)
-    conn.close()
-    if result.empty:
-        logger.error("No matching query found in the history.")
-        raise ValueError("No matching query found in the history.")
-    execution_time = result['execution_time'].iloc[0] / 1000  # Convert to seconds
+def get_execution_time(query_id: str) -> float:
+    logger.info(f"Fetching execution time from Snowflake for query ID {query_id}.")
+    execution_time = get_query_stats(get_snowflake_connection, query_id)['execution_time']
     logger.info(f"Execution time retrieved: {execution_time} seconds")
     return execution_time
 
 def execute_query(query: str) -> pd.DataFrame:
     logger.info("Executing query in Snowflake.")
-    conn = get_snowflake_connection()
-    result = pd.read_sql(query, conn)
-    conn.close()
-    return result
+    return run_query(get_snowflake_connection, query).result
 
-def compare_and_execute_queries(original_query: str, optimized_query: str) -> tuple:
-    logger.info("Comparing and executing queries.")
-    
-    # Execute both queries to ensure they're in the query history
-    original_result = execute_query(original_query)
-    optimized_result = execute_query(optimized_query)
+# verification: "client" streams both results into fingerprints, "server" compares
+# HASH_AGG summaries inside the warehouse and falls back to "client" when it cannot decide
+def compare_and_execute_queries(original_query: str, optimized_query: str, verification: str = "client") -> tuple:
+    logger.info(f"Comparing and executing queries ({verification}-side verification).")
     
-    # Wait for a short time to ensure queries are recorded in history
-    time.sleep(5)
+    # Execute both queries in parallel, each on its own pooled connection
+    original_run, optimized_run = execute_queries_concurrently(
+        get_snowflake_connection,
+        [original_query, optimized_query],
+        result_mode="fingerprint" if verification == "client" else "none"
+    )
     
-    # Get execution times for both queries
-    try:
-        original_execution_time = get_execution_time(original_query)
-        optimized_execution_time = get_execution_time(optimized_query)
-    except ValueError as e:
-        logger.error(f"Error retrieving execution times: {str(e)}")
-        st.error(f"Error retrieving execution times: {str(e)}")
+    # Get server-side execution times for both query IDs in one lookup
+    query_stats = get_query_stats_batch(
+        get_snowflake_connection,
+        [original_run.query_id, optimized_run.query_id]
+    )
+    if original_run.query_id not in query_stats or optimized_run.query_id not in query_stats:
+        logger.error("Error retrieving execution times: query IDs not found in the history.")
         return None, None, None, None, None
+    original_execution_time = query_stats[original_run.query_id]['execution_time']
+    optimized_execution_time = query_stats[optimized_run.query_id]['execution_time']
     
-    # Compare results
-    results_match = original_result.equals(optimized_result)
+    # Compare results (same rows in any order, same columns in any order)
+    if verification == "server":
+        results_match = server_results_equal(get_snowflake_connection, original_run, optimized_run)
+        if results_match is None:
+            logger.info("Falling back to client-side comparison of the persisted results.")
+            results_match = query_results_equal(
+                get_snowflake_connection,
+                RESULT_SCAN_SQL,
+                RESULT_SCAN_SQL,
+                original_params=(original_run.query_id,),
+                optimized_params=(optimized_run.query_id,)
+            )
+    else:
+        results_match = original_run.fingerprint == optimized_run.fingerprint
     
     return original_query, original_execution_time, optimized_query, optimized_execution_time, results_match
 
-# ... (keep other functions like cortex_inference, query_sql_checker_tool, optimize_query, remove_single_quotes)
+# Background job: compare the plans if asked, then execute and compare both queries unless the plans settled it
+# Runs on the job queue, so it must not touch st.session_state or render anything
+def run_comparison_job(sql_query: str, checked_query: str, optimized_query: str, verification: str, plan_first: bool,
+                       model: str = None) -> dict:
+    plan_comparison = None
+    comparison_results = None
+    if plan_first:
+        plan_comparison = compare_query_plans(get_snowflake_connection, sql_query, optimized_query)
+
+    if plan_comparison is None or plan_comparison.verdict == "ambiguous":
+        results = compare_and_execute_queries(sql_query, optimized_query, verification=verification)
+        if results[0] is None:
+            raise RuntimeError("Failed to retrieve comparison results.")
+        original_query, original_time, optimized_query, optimized_time, results_match = results
+        comparison_results = {
+            'original_query': original_query,
+            'original_time': original_time,
+            'optimized_query': optimized_query,
+            'optimized_time': optimized_time,
+            'results_match': results_match
+        }
+        # Recorded by the job itself, so the run is kept even if the page is closed meanwhile
+        get_run_store().record_run(
+            original_query,
+            checked_query,
+            optimized_query,
+            original_time,
+            optimized_time,
+            results_match,
+            verification,
+            model or UNKNOWN_MODEL
+        )
+        get_model_router().record_verification(model, results_match)
+    return {'plan_comparison': plan_comparison, 'comparison_results': comparison_results}
+
+# Job IDs this session is waiting on, by session state key
+JOB_KEYS = ('sample_job', 'comparison_job', 'benchmark_job')
+
+# Function to check on the background job stored under a session state key
+# Returns the job once it has succeeded; shows its status while it is in flight
+def poll_job(key: str):
+    job_id = st.session_state.get(key)
+    if not job_id:
+        return None
+    job = get_job_queue().get(job_id)
+    if job is None:
+        st.session_state[key] = None
+        st.warning(f"Job {job_id} is no longer known to the server; please run it again.")
+        return None
+    if not job.done:
+        st.info(job_status_message(job))
+        return None
+    st.session_state[key] = None
+    if job.state == "failed":
+        st.error(f"An error occurred: {job.error}")
+        return None
+    return job
 
 def main():
     st.title("Snowflake SQL Optimizer with Cortex")
@@ -294,10 +357,23 @@ def main():
         st.session_state.optimized_query = ''
     if 'comparison_results' not in st.session_state:
         st.session_state.comparison_results = None
+    if 'plan_comparison' not in st.session_state:
+        st.session_state.plan_comparison = None
+    if 'benchmark_result' not in st.session_state:
+        st.session_state.benchmark_result = None
+    if 'sample_validation' not in st.session_state:
+        st.session_state.sample_validation = None
+    # Model that produced the current optimized query; None when no known model did
+    if 'optimizer_model' not in st.session_state:
+        st.session_state.optimizer_model = None
+    for key in JOB_KEYS:
+        if key not in st.session_state:
+            st.session_state[key] = None
 
     # Inputs from the user
     sql_query = st.text_area("Enter your SQL query:", value=st.session_state.sql_query)
 
+    rerun = st.checkbox("Re-run even if a verified result exists")
     if st.button("Optimize Query"):
         if not sql_query:
             st.error("Please enter a SQL query.")
@@ -306,59 +382,164 @@ def main():
         # Save SQL query in session state
         st.session_state.sql_query = sql_query
 
-        # Show progress in UI
-        with st.spinner("Processing..."):
-            try:
-                logger.info(f"User-provided SQL query: {sql_query}")
-
-                # Step 1: Check the SQL query for errors using Cortex
-                st.write("Checking SQL query for common mistakes...")
-                st.session_state.checked_query = query_sql_checker_tool(sql_query)
-                st.write("Checked SQL Query for common mistakes:")
-                st.code(st.session_state.checked_query)
-
-                # Step 2: Optimize the SQL query
-                st.write("Optimizing the SQL query...")
-                st.session_state.optimized_query = optimize_query(st.session_state.checked_query)
-                st.write("Optimized SQL Query:")
-                st.code(st.session_state.optimized_query)
-
-            except Exception as e:
-                logger.error(f"An error occurred: {str(e)}")
-                st.error(f"An error occurred: {str(e)}")
+        # A verified run of this exact query short-circuits the whole pipeline; a run of another variant
+        # only provides a candidate optimization, which still has to be run and compared below
+        prior_run = None if rerun else get_run_store().find_verified_run(sql_query)
+        candidate_run = None if rerun or prior_run else get_run_store().find_candidate_run(sql_query)
+        if prior_run is not None:
+            st.session_state.checked_query = prior_run.checked_query
+            st.session_state.optimized_query = prior_run.optimized_query
+            st.session_state.comparison_results = prior_run.comparison_results()
+            st.session_state.optimizer_model = None if prior_run.model == UNKNOWN_MODEL else prior_run.model
+            st.info(f"Reusing a verified run of this query from {datetime.fromtimestamp(prior_run.created_at):%Y-%m-%d %H:%M} "
+                    f"({prior_run.model}, {prior_run.verification}-side verification).")
+            st.write("Optimized SQL Query:")
+            st.code(st.session_state.optimized_query)
+        elif candidate_run is not None:
+            st.session_state.checked_query = candidate_run.checked_query
+            st.session_state.optimized_query = candidate_run.optimized_query
+            st.session_state.comparison_results = None
+            st.session_state.optimizer_model = None if candidate_run.model == UNKNOWN_MODEL else candidate_run.model
+            st.warning(f"Adapted an optimization verified for a variant of this query on "
+                       f"{datetime.fromtimestamp(candidate_run.created_at):%Y-%m-%d %H:%M} ({candidate_run.model}). "
+                       f"It has not been verified for this query: run it below to compare the results.")
+            st.write("Optimized SQL Query (unverified):")
+            st.code(st.session_state.optimized_query)
+        else:
+            # Show progress in UI
+            with st.spinner("Processing..."):
+                try:
+                    logger.info(f"User-provided SQL query: {sql_query}")
+
+                    # Step 1: Check the SQL query for errors using Cortex
+                    st.write("Checking SQL query for common mistakes...")
+                    st.session_state.checked_query = extract_sql(query_sql_checker_tool(sql_query))
+                    st.write("Checked SQL Query for common mistakes:")
+                    st.code(st.session_state.checked_query)
+
+                    # Step 2: Apply the deterministic local rewrites; these are shown straight away
+                    rewrite = rewrite_query(st.session_state.checked_query)
+                    if rewrite.changed:
+                        st.write(f"Local rewrites applied ({', '.join(rewrite.applied)}):")
+                        st.code(rewrite.sql)
+
+                    # Step 3: Optimize the SQL query, rendering the completion as it streams in
+                    # and parsing its code blocks in the same pass
+                    if get_model_router().races("optimize"):
+                        # Racing models: the first answer with valid SQL wins, so nothing is streamed
+                        models = get_model_router().models_for("optimize")
+                        with st.spinner(f"Optimizing the SQL query (racing {', '.join(models)})..."):
+                            model, completion = route_completion(build_optimize_prompt(st.session_state.checked_query), "optimize")
+                        st.write(f"Optimized by {model}.")
+                        st.session_state.optimizer_model = model
+                        st.session_state.optimized_query = extract_sql(completion) or rewrite.sql
+                    else:
+                        model = get_model_router().model_for("optimize")
+                        st.write(f"Optimizing the SQL query ({model})...")
+                        parser = FenceParser()
+                        completion = st.write_stream(tee_to_parser(stream_optimize_query(st.session_state.checked_query, model), parser))
+                        st.session_state.optimizer_model = model
+                        st.session_state.optimized_query = parser.close().optimized_code() or extract_sql(completion) or rewrite.sql
+                    st.write("Optimized SQL Query:")
+                    st.code(st.session_state.optimized_query)
+
+                except Exception as e:
+                    logger.error(f"An error occurred: {str(e)}")
+                    st.error(f"An error occurred: {str(e)}")
+
+    # Step 4: Validate on a deterministic sample of the tables; cheap first pass before a full run
+    if st.session_state.optimized_query:
+        sample_percent = st.slider("Sample size (% of rows):", min_value=0.1, max_value=10.0, value=DEFAULT_SAMPLE_PERCENT, step=0.1)
+        sample_mode = st.radio(
+            "Sampling:",
+            SAMPLE_MODES,
+            format_func=lambda mode: "Inline SAMPLE clauses" if mode == "inline" else "Temporary sample tables",
+            horizontal=True
+        )
+        if st.button("Validate on Sample", disabled=bool(st.session_state.sample_job)):
+            st.session_state.sample_validation = None
+            st.session_state.sample_job = get_job_queue().submit(
+                "sample",
+                validate_on_sample,
+                get_snowflake_connection,
+                st.session_state.sql_query,
+                st.session_state.optimized_query,
+                percent=sample_percent,
+                mode=sample_mode
+            )
+
+    sample_job = poll_job('sample_job')
+    if sample_job:
+        st.session_state.sample_validation = sample_job.result
+
+    # Step 5: Display the sample validation if available
+    if st.session_state.sample_validation:
+        sample_validation = st.session_state.sample_validation
+        st.write(f"Sample Validation ({sample_validation.percent}% of rows):")
+        st.write(f"Original Query Execution Time on Sample: {sample_validation.original_stats.get('execution_time')} seconds")
+        st.write(f"Optimized Query Execution Time on Sample: {sample_validation.optimized_stats.get('execution_time')} seconds")
+        speedup = sample_speedup(sample_validation)
+        if speedup is not None:
+            st.write(f"Estimated speedup on the sample: {speedup:.2f}x")
+        if not sample_validation.conclusive:
+            st.info("Both queries returned no rows on the sample; try a larger sample or run the full comparison.")
+        elif sample_validation.results_match:
+            st.success("The results of both queries match on the sample. Run the full comparison to confirm.")
+        else:
+            st.warning("The results of the queries do not match on the sample.")
 
-    # Step 3: Run Optimized Query
+    # Step 6: Run Optimized Query (full run)
     if st.session_state.optimized_query:
-        if st.button("Run Optimized Query"):
-            try:
-                # Step 4: Remove single quotes from optimized query
-                optimized_query_no_quotes = remove_single_quotes(st.session_state.optimized_query)
-                st.write("Optimized SQL Query (without single quotes):")
-                st.code(optimized_query_no_quotes)
-
-                # Step 5: Compare and execute queries
-                st.write("Comparing and executing queries...")
-                comparison_results = compare_and_execute_queries(
-                    st.session_state.sql_query,
-                    optimized_query_no_quotes
-                )
-
-                if comparison_results[0] is not None:
-                    original_query, original_time, optimized_query, optimized_time, results_match = comparison_results
-                    # Store results in session state
-                    st.session_state.comparison_results = {
-                        'original_query': original_query,
-                        'original_time': original_time,
-                        'optimized_query': optimized_query,
-                        'optimized_time': optimized_time,
-                        'results_match': results_match
-                    }
-                else:
-                    st.error("Failed to retrieve comparison results.")
-
-            except Exception as e:
-                logger.error(f"An error occurred: {str(e)}")
-                st.error(f"An error occurred: {str(e)}")
+        verification = st.radio(
+            "Result verification:",
+            ["client", "server"],
+            format_func=lambda mode: "Client-side (fetch results)" if mode == "client" else "Server-side (hash aggregates)",
+            horizontal=True
+        )
+        plan_first = st.checkbox("Estimate with EXPLAIN first (execute only when the plans are too close to call)")
+        if st.button("Run Optimized Query", disabled=bool(st.session_state.comparison_job)):
+            # Steps 7 and 8 (plan comparison, then execution and result comparison) run as a background
+            # job, so reruns of this page no longer abort them
+            st.session_state.plan_comparison = None
+            st.session_state.comparison_results = None
+            st.session_state.comparison_job = get_job_queue().submit(
+                "comparison",
+                run_comparison_job,
+                st.session_state.sql_query,
+                st.session_state.checked_query,
+                st.session_state.optimized_query,
+                verification,
+                plan_first,
+                st.session_state.optimizer_model
+            )
+
+    comparison_job = poll_job('comparison_job')
+    if comparison_job:
+        st.session_state.plan_comparison = comparison_job.result['plan_comparison']
+        st.session_state.comparison_results = comparison_job.result['comparison_results']
+
+    # Display the plan estimate if available
+    if st.session_state.plan_comparison:
+        plan_comparison = st.session_state.plan_comparison
+        st.write("Plan Comparison (EXPLAIN):")
+        st.table(pd.DataFrame(
+            {
+                'Partitions assigned': [plan_comparison.original.partitions_assigned, plan_comparison.optimized.partitions_assigned],
+                'Partitions total': [plan_comparison.original.partitions_total, plan_comparison.optimized.partitions_total],
+                'Bytes assigned': [plan_comparison.original.bytes_assigned, plan_comparison.optimized.bytes_assigned],
+                'Joins': [plan_comparison.original.joins, plan_comparison.optimized.joins],
+                'Operator cost': [plan_comparison.original.operator_cost, plan_comparison.optimized.operator_cost],
+            },
+            index=['Original', 'Optimized']
+        ))
+        if plan_comparison.verdict == "better":
+            st.success(f"The optimized plan is estimated to be cheaper: {plan_comparison.reason}.")
+        elif plan_comparison.verdict == "worse":
+            st.warning(f"The optimized plan is estimated to be more expensive: {plan_comparison.reason}.")
+        else:
+            st.info(f"The plans are too close to call ({plan_comparison.reason}); both queries were executed.")
+        if plan_comparison.verdict != "ambiguous":
+            st.caption("The queries were not executed, so their results were not compared.")
 
     # Display comparison results if available
     if st.session_state.comparison_results:
@@ -375,60 +556,53 @@ def main():
             st.success("The optimized query is faster!")
         else:
             st.warning("The optimized query is slower or has no improvement.")
+        st.caption("Timings above are from a single run; benchmark the queries for a reliable comparison.")
 
-if __name__ == "__main__":
-    main()
-
-
-
-def df_content_equals(df1, df2):
-    # Sort columns alphabetically
-    df1_sorted = df1.reindex(sorted(df1.columns), axis=1)
-    df2_sorted = df2.reindex(sorted(df2.columns), axis=1)
-    
-    # Reset index
-    df1_sorted = df1_sorted.reset_index(drop=True)
-    df2_sorted = df2_sorted.reset_index(drop=True)
-    
-    # Compare the DataFrames
-    return df1_sorted.equals(df2_sorted)
-
-
-def df_content_equals(df1, df2):
-    # Sort columns alphabetically
-    df1_sorted = df1.reindex(sorted(df1.columns), axis=1)
-    df2_sorted = df2.reindex(sorted(df2.columns), axis=1)
-    
-    # Sort rows based on all columns to handle row randomness
-    df1_sorted = df1_sorted.sort_values(by=list(df1_sorted.columns)).reset_index(drop=True)
-    df2_sorted = df2_sorted.sort_values(by=list(df2_sorted.columns)).reset_index(drop=True)
-    
-    # Compare the DataFrames
-    return df1_sorted.equals(df2_sorted)
-
-
-def df_content_equals(df1, df2):
-    # Find the common columns
-    common_columns = df1.columns.intersection(df2.columns)
-    
-    # Sort columns alphabetically within common columns
-    df1_sorted = df1[common_columns].reindex(sorted(common_columns), axis=1)
-    df2_sorted = df2[common_columns].reindex(sorted(common_columns), axis=1)
-    
-    # Sort rows based on all common columns to handle row randomness
-    df1_sorted = df1_sorted.sort_values(by=list(df1_sorted.columns)).reset_index(drop=True)
-    df2_sorted = df2_sorted.sort_values(by=list(df2_sorted.columns)).reset_index(drop=True)
-    
-    # Compare the DataFrames
-    return df1_sorted.equals(df2_sorted)
-
-import pandas as pd
-import hashlib
+    # Step 9: Benchmark both queries over repeated, interleaved runs with the result cache disabled
+    if st.session_state.optimized_query:
+        trials = st.number_input("Benchmark trials per query:", min_value=3, max_value=50, value=DEFAULT_TRIALS)
+        if st.button("Benchmark Queries", disabled=bool(st.session_state.benchmark_job)):
+            st.session_state.benchmark_result = None
+            st.session_state.benchmark_job = get_job_queue().submit(
+                "benchmark",
+                benchmark_queries,
+                get_snowflake_connection,
+                st.session_state.sql_query,
+                st.session_state.optimized_query,
+                trials=trials
+            )
+
+    benchmark_job = poll_job('benchmark_job')
+    if benchmark_job:
+        st.session_state.benchmark_result = benchmark_job.result
+
+    if st.session_state.benchmark_result:
+        benchmark_result = st.session_state.benchmark_result
+        st.write("Benchmark Results (seconds):")
+        st.table(benchmark_result.summary)
+        low, high = benchmark_result.confidence_interval
+        message = (f"Speedup {benchmark_result.speedup:.2f}x (95% CI {low:.2f}x-{high:.2f}x, "
+                   f"Mann-Whitney p={benchmark_result.p_value:.3f})")
+        if benchmark_result.verdict == "faster":
+            st.success(f"The optimized query is significantly faster. {message}")
+        elif benchmark_result.verdict == "slower":
+            st.warning(f"The optimized query is significantly slower. {message}")
+        else:
+            st.info(f"No significant difference between the queries. {message}")
+
+    # Latency and quality of each model, as recorded by the router
+    with st.sidebar.expander("Model ledger"):
+        ledger = get_model_router().ledger
+        model_stats = ledger.stats() if ledger else []
+        if model_stats:
+            st.dataframe(pd.DataFrame(model_stats).set_index('model'))
+        else:
+            st.caption("No Cortex calls recorded yet.")
 
-def hash_row(row):
-    """Hashes a row by converting it to a string and using a hash function."""
-    row_string = ','.join(map(str, row))
-    return hashlib.md5(row_string.encode()).hexdigest()
+    # Poll while any of this session's jobs is in flight; the jobs themselves are unaffected by reruns
+    if any(st.session_state[key] for key in JOB_KEYS):
+        time.sleep(DEFAULT_POLL_INTERVAL)
+        st.rerun()
 
 def df_content_equals(df1, df2):
     # Find common columns
@@ -438,16 +612,12 @@ def df_content_equals(df1, df2):
     df1_common = df1[common_columns]
     df2_common = df2[common_columns]
     
-    # Hash each row in both DataFrames
-    df1_hashes = df1_common.apply(hash_row, axis=1).sort_values().reset_index(drop=True)
-    df2_hashes = df2_common.apply(hash_row, axis=1).sort_values().reset_index(drop=True)
-    
-    # Aggregate the hashes (e.g., by concatenating them) and compare
-    df1_aggregate_hash = hashlib.md5(''.join(df1_hashes).encode()).hexdigest()
-    df2_aggregate_hash = hashlib.md5(''.join(df2_hashes).encode()).hexdigest()
+    # Hash every row in one vectorized pass (NULLs, numbers and timestamps canonicalized)
+    df1_hashes = np.sort(hash_rows(df1_common))
+    df2_hashes = np.sort(hash_rows(df2_common))
     
-    # Return whether the aggregate hashes match
-    return df1_aggregate_hash == df2_aggregate_hash
-
-
+    # Matching sorted hashes mean the same rows in any order
+    return np.array_equal(df1_hashes, df2_hashes)
 
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
 import streamlit as st
-import pandas as pd
 import snowflake.connector
 import logging
+import time
 from datetime import datetime
+from Fetch import read_arrow
+from Executor import run_query
+from Extraction import extract_sql
+from History import get_query_stats
+from Jobs import DEFAULT_POLL_INTERVAL, get_job_queue, job_status_message
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -26,15 +31,16 @@ system_message = """
 # Define Snowflake connection (Already handled by the user)
 def get_snowflake_connection():
     # Assuming the user has a function to handle the connection internally
+    # Statements use ? placeholders: open the connection with paramstyle="qmark"
     conn = None  # Placeholder
     return conn
 
 # Function to use Snowflake Cortex for inference
 def cortex_inference(prompt: str) -> str:
     logger.info(f"Sending prompt to Snowflake Cortex: {prompt}")
-    query = f"SELECT SNOWFLAKE.CORTEX.COMPLETE('snowflake-arctic', '{prompt}');"
+    query = "SELECT SNOWFLAKE.CORTEX.COMPLETE('snowflake-arctic', ?);"
     conn = get_snowflake_connection()
-    result = pd.read_sql(query, conn)
+    result = read_arrow(query, conn, params=(prompt,))
     return result.iloc[0, 0]
 
 # Query SQL Checker Tool
@@ -59,19 +65,28 @@ def query_sql_checker_tool(query: str) -> str:
 def get_execution_time(query: str) -> float:
     logger.info("Fetching execution time from Snowflake.")
     conn = get_snowflake_connection()
-    query_history = f"""
+    query_history = """
         SELECT query_id, execution_time
         FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
-        WHERE query_text = '{query}' 
+        WHERE query_text = ?
         AND query_start_time >= DATEADD(day, -7, CURRENT_TIMESTAMP())
         ORDER BY query_start_time DESC
         LIMIT 1;
     """
-    result = pd.read_sql(query_history, conn)
+    result = read_arrow(query_history, conn, params=(query,))
     if result.empty:
         logger.error("No matching query found in the history.")
         raise ValueError("No matching query found in the history.")
-    execution_time = result['execution_time'].iloc[0]
+    execution_time = result['execution_time'].iloc[0] / 1000  # Convert to seconds
+    logger.info(f"Execution time retrieved: {execution_time} seconds")
+    return execution_time
+
+# Function to run a query and get its execution time via the captured query ID
+def measure_execution_time(query: str) -> float:
+    logger.info("Running query to measure its execution time.")
+    # Only the query ID is needed, so the result is not fetched
+    query_id = run_query(get_snowflake_connection, query, result_mode="none").query_id
+    execution_time = get_query_stats(get_snowflake_connection, query_id)['execution_time']
     logger.info(f"Execution time retrieved: {execution_time} seconds")
     return execution_time
 
@@ -86,6 +101,15 @@ def optimize_query(query: str) -> str:
 def main():
     st.title("Snowflake SQL Optimizer with Cortex")
 
+    # Initialize session state variables if not present; buttons only fire on the rerun they are clicked in,
+    # so everything a later step needs is kept here
+    if 'optimized_query' not in st.session_state:
+        st.session_state.optimized_query = ''
+    if 'execution_time' not in st.session_state:
+        st.session_state.execution_time = None
+    if 'run_job' not in st.session_state:
+        st.session_state.run_job = None
+
     # Inputs from the user
     sql_query = st.text_area("Enter your SQL query:")
     execution_time_input = st.text_input("Execution Time (optional):")
@@ -112,34 +136,53 @@ def main():
             st.code(checked_query)
 
             # Step 3: Optimize the SQL query
-            optimized_query = optimize_query(checked_query)
-            st.write("Optimized SQL Query:")
-            st.code(optimized_query)
-
-            # Step 4: Ask for user permission to run optimized query
-            if st.button("Run Optimized Query"):
-                logger.info("User approved running the optimized query.")
-                conn = get_snowflake_connection()
-
-                # Get execution time of the optimized query
-                st.write("Running optimized query...")
-                optimized_execution_time = get_execution_time(optimized_query)
-
-                # Step 5: Display comparison of original and optimized queries
-                st.write(f"Original Execution Time: {execution_time} seconds")
-                st.write(f"Optimized Execution Time: {optimized_execution_time} seconds")
-
-                if optimized_execution_time < execution_time:
-                    st.success("The optimized query is faster!")
-                else:
-                    st.warning("The optimized query is slower or has no improvement.")
-
-                logger.info(f"Original Execution Time: {execution_time} seconds")
-                logger.info(f"Optimized Execution Time: {optimized_execution_time} seconds")
+            st.session_state.optimized_query = optimize_query(checked_query)
+            st.session_state.execution_time = execution_time
 
         except Exception as e:
             logger.error(f"An error occurred: {str(e)}")
             st.error(f"An error occurred: {str(e)}")
 
+    if st.session_state.optimized_query:
+        st.write("Optimized SQL Query:")
+        st.code(st.session_state.optimized_query)
+
+        # Step 4: Ask for user permission to run optimized query; it runs as a background job
+        if st.button("Run Optimized Query", disabled=bool(st.session_state.run_job)):
+            logger.info("User approved running the optimized query.")
+            st.session_state.run_job = get_job_queue().submit(
+                "run", measure_execution_time, extract_sql(st.session_state.optimized_query)
+            )
+
+    if st.session_state.run_job:
+        job = get_job_queue().get(st.session_state.run_job)
+        if job is None:
+            st.session_state.run_job = None
+            st.warning("The optimized query run is no longer known to the server; please run it again.")
+        elif not job.done:
+            st.write("Running optimized query...")
+            st.info(job_status_message(job))
+            time.sleep(DEFAULT_POLL_INTERVAL)
+            st.rerun()
+        elif job.state == "failed":
+            st.session_state.run_job = None
+            st.error(f"An error occurred: {job.error}")
+        else:
+            st.session_state.run_job = None
+            execution_time = st.session_state.execution_time
+            optimized_execution_time = job.result
+
+            # Step 5: Display comparison of original and optimized queries
+            st.write(f"Original Execution Time: {execution_time} seconds")
+            st.write(f"Optimized Execution Time: {optimized_execution_time} seconds")
+
+            if optimized_execution_time < execution_time:
+                st.success("The optimized query is faster!")
+            else:
+                st.warning("The optimized query is slower or has no improvement.")
+
+            logger.info(f"Original Execution Time: {execution_time} seconds")
+            logger.info(f"Optimized Execution Time: {optimized_execution_time} seconds")
+
 if __name__ == "__main__":
     main()
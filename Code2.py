@@ -1,9 +1,9 @@
 import streamlit as st
-import pandas as pd
 import snowflake.connector
 import logging
 from datetime import datetime
 import time
+from Fetch import read_arrow
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -26,15 +26,16 @@ system_message = """
 
 # Define Snowflake connection (Already handled by the user)
 def get_snowflake_connection():
+    # Statements use ? placeholders: open the connection with paramstyle="qmark"
     conn = None  # Placeholder
     return conn
 
 # Function to use Snowflake Cortex for inference
 def cortex_inference(prompt: str) -> str:
     logger.info(f"Sending prompt to Snowflake Cortex: {prompt}")
-    query = f"SELECT SNOWFLAKE.CORTEX.COMPLETE('snowflake-arctic', '{prompt}');"
+    query = "SELECT SNOWFLAKE.CORTEX.COMPLETE('snowflake-arctic', ?);"
     conn = get_snowflake_connection()
-    result = pd.read_sql(query, conn)
+    result = read_arrow(query, conn, params=(prompt,))
     return result.iloc[0, 0]
 
 # Query SQL Checker Tool
@@ -59,15 +60,15 @@ def query_sql_checker_tool(query: str) -> str:
 def get_execution_time(query: str) -> float:
     logger.info("Fetching execution time from Snowflake.")
     conn = get_snowflake_connection()
-    query_history = f"""
+    query_history = """
         SELECT query_id, execution_time
         FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
-        WHERE query_text = '{query}' 
+        WHERE query_text = ?
         AND query_start_time >= DATEADD(day, -7, CURRENT_TIMESTAMP())
         ORDER BY query_start_time DESC
         LIMIT 1;
     """
-    result = pd.read_sql(query_history, conn)
+    result = read_arrow(query_history, conn, params=(query,))
     if result.empty:
         logger.error("No matching query found in the history.")
         raise ValueError("No matching query found in the history.")
@@ -82,11 +83,6 @@ def optimize_query(query: str) -> str:
     optimized_query = cortex_inference(prompt)
     return optimized_query
 
-# Function to remove all single inverted commas (') from the query
-def remove_single_quotes(query: str) -> str:
-    logger.info("Removing single inverted commas from the query.")
-    return query.replace("'", "")
-
 # Streamlit application for SQL optimization
 def main():
     st.title("Snowflake SQL Optimizer with Cortex")
@@ -136,18 +132,13 @@ def main():
                 if st.button("Run Optimized Query"):
                     logger.info("User approved running the optimized query.")
 
-                    # Step 6: Remove single quotes from the optimized query
-                    optimized_query_no_quotes = remove_single_quotes(checked_optimized_query)
-                    st.write("Optimized SQL Query (without single quotes):")
-                    st.code(optimized_query_no_quotes)
-
                     conn = get_snowflake_connection()
 
                     # Get execution time of the optimized query
                     st.write("Running optimized query...")
-                    optimized_execution_time = get_execution_time(optimized_query_no_quotes)
+                    optimized_execution_time = get_execution_time(checked_optimized_query)
 
-                    # Step 7: Display comparison of original and optimized queries
+                    # Step 6: Display comparison of original and optimized queries
                     st.write(f"Original Execution Time: {execution_time} seconds")
                     st.write(f"Optimized Execution Time: {optimized_execution_time} seconds")
 
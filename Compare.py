@@ -0,0 +1,166 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from Fetch import FALLBACK_BATCH_SIZE, iter_cursor_batches
+from Hashing import hash_column, hash_rows
+
+logger = logging.getLogger(__name__)
+
+
+class ResultFingerprint:
+    """Order-independent multiset fingerprint of a result set, built one batch at a time."""
+
+    def __init__(self, columns: List[str]):
+        # Column order does not matter, so columns are tracked in (upper-cased) name order; batches are
+        # read by position, so duplicate names (e.g. two joined ID columns) keep their relative order
+        names = [column.upper() for column in columns]
+        self._positions = sorted(range(len(names)), key=lambda position: names[position])
+        self.columns = [names[position] for position in self._positions]
+        self.row_count = 0
+        self.hash_sum = np.uint64(0)
+        self.hash_xor = np.uint64(0)
+        self.column_checksums = [np.uint64(0)] * len(self.columns)
+
+    # df holds a batch of the result, with its columns in result order
+    def update(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        df = df.iloc[:, self._positions].set_axis(self.columns, axis=1)
+        row_hashes = hash_rows(df)
+        self.row_count += len(row_hashes)
+        # uint64 arithmetic wraps, which is exactly the modular sum we want
+        with np.errstate(over='ignore'):
+            self.hash_sum += row_hashes.sum(dtype=np.uint64)
+            for position in range(len(self.columns)):
+                self.column_checksums[position] += hash_column(df.iloc[:, position]).sum(dtype=np.uint64)
+        self.hash_xor ^= np.bitwise_xor.reduce(row_hashes)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ResultFingerprint):
+            return NotImplemented
+        return (
+            self.columns == other.columns
+            and self.row_count == other.row_count
+            and self.hash_sum == other.hash_sum
+            and self.hash_xor == other.hash_xor
+            and self.column_checksums == other.column_checksums
+        )
+
+    def __repr__(self) -> str:
+        return f"ResultFingerprint(rows={self.row_count}, sum={int(self.hash_sum):016x}, xor={int(self.hash_xor):016x})"
+
+
+# Function to fingerprint an executed cursor's result without holding it in memory
+def fingerprint_cursor(cursor) -> ResultFingerprint:
+    fingerprint = ResultFingerprint([column[0] for column in cursor.description])
+    for batch in iter_cursor_batches(cursor, nullable=True):
+        fingerprint.update(batch)
+    return fingerprint
+
+
+# Function to fingerprint an in-memory DataFrame in batches
+def fingerprint_dataframe(df: pd.DataFrame, batch_size: int = FALLBACK_BATCH_SIZE) -> ResultFingerprint:
+    fingerprint = ResultFingerprint(list(df.columns))
+    df = df.convert_dtypes()
+    for start in range(0, len(df), batch_size):
+        fingerprint.update(df.iloc[start:start + batch_size])
+    return fingerprint
+
+
+# Function to run a query and fingerprint its result on one pooled connection
+def fingerprint_query(get_connection: Callable, query: str, params: Optional[tuple] = None) -> ResultFingerprint:
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+            fingerprint = fingerprint_cursor(cursor)
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+    logger.info(f"Fingerprinted result: {fingerprint}")
+    return fingerprint
+
+
+# Function to decide whether two queries return the same multiset of rows
+def query_results_equal(get_connection: Callable, original_query: str, optimized_query: str,
+                        original_params: Optional[tuple] = None, optimized_params: Optional[tuple] = None) -> bool:
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        original = executor.submit(fingerprint_query, get_connection, original_query, original_params)
+        optimized = executor.submit(fingerprint_query, get_connection, optimized_query, optimized_params)
+        return original.result() == optimized.result()
+
+
+# Function to quote a result column name as a Snowflake identifier
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+# SQL that re-reads a finished query's persisted result; bind the query ID
+RESULT_SCAN_SQL = "SELECT * FROM TABLE(RESULT_SCAN(?))"
+
+
+# Function to build a warehouse-side summary of a finished query's result:
+# row count, an order-independent hash of all rows, and one hash per column
+def build_result_summary_sql(columns: List[str]) -> str:
+    ordered = sorted(columns, key=str.upper)
+    row_hash = ", ".join(quote_identifier(column) for column in ordered)
+    column_hashes = ", ".join(f"HASH_AGG({quote_identifier(column)})" for column in ordered)
+    return f"""
+        SELECT COUNT(*), HASH_AGG({row_hash}), {column_hashes}
+        FROM TABLE(RESULT_SCAN(?));
+    """
+
+
+# Function to summarize a finished query's result inside the warehouse; only a few scalars come back
+def summarize_result(get_connection: Callable, query_id: str, columns: List[str]) -> dict:
+    ordered = sorted(columns, key=str.upper)
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(build_result_summary_sql(columns), (query_id,))
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+    return {
+        'row_count': row[0],
+        'result_hash': row[1],
+        'column_hashes': {column.upper(): value for column, value in zip(ordered, row[2:])},
+    }
+
+
+# Function to compare two finished queries' results in the warehouse
+# Returns None when the comparison cannot be made there (e.g. different column names or an unsupported type)
+def server_results_equal(get_connection: Callable, original_run, optimized_run) -> Optional[bool]:
+    original_columns = sorted(column.upper() for column in original_run.columns)
+    optimized_columns = sorted(column.upper() for column in optimized_run.columns)
+    if original_columns != optimized_columns or len(set(original_columns)) != len(original_columns):
+        logger.warning("Result columns differ or are ambiguous; server-side comparison not possible.")
+        return None
+    try:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            original = executor.submit(summarize_result, get_connection, original_run.query_id, original_run.columns)
+            optimized = executor.submit(summarize_result, get_connection, optimized_run.query_id, optimized_run.columns)
+            original_summary, optimized_summary = original.result(), optimized.result()
+    except Exception as e:
+        logger.warning(f"Server-side comparison failed: {str(e)}")
+        return None
+
+    mismatched = [
+        column for column in original_summary['column_hashes']
+        if original_summary['column_hashes'][column] != optimized_summary['column_hashes'][column]
+    ]
+    if mismatched:
+        logger.info(f"Columns whose contents differ: {mismatched}")
+    return (
+        original_summary['row_count'] == optimized_summary['row_count']
+        and original_summary['result_hash'] == optimized_summary['result_hash']
+    )
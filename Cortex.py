@@ -0,0 +1,228 @@
+import asyncio
+import json
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Client defaults
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_RATE_PER_SECOND = 2.0  # Sustained completions started per second
+DEFAULT_BURST = 4  # Completions that may start back to back before the rate applies
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 8.0
+DEFAULT_TIMEOUT = 120.0
+
+# Cortex REST endpoint used for streamed completions
+CORTEX_COMPLETE_PATH = "/api/v2/cortex/inference:complete"
+
+# Error text that marks a failure as transient (throttling, overload, dropped connections)
+# Timeouts are deliberately absent: see AsyncCortexClient.complete
+TRANSIENT_ERROR_MARKERS = (
+    "throttl",
+    "rate limit",
+    "too many requests",
+    "429",
+    "503",
+    "temporarily unavailable",
+    "service unavailable",
+    "connection reset",
+)
+
+
+# Function to decide whether a failed completion is worth retrying
+def is_transient_error(error: Exception) -> bool:
+    if isinstance(error, ConnectionError):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in TRANSIENT_ERROR_MARKERS)
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncCortexClient:
+    """Runs blocking Cortex completions on a private event loop with concurrency, rate, retry and timeout limits.
+
+    One client is meant to be shared by every caller in the process, so the limits hold globally.
+    `complete_fn(prompt, model)` performs a single completion and blocks until it returns; callers with
+    another kind of completion (e.g. a chat messages array) pass their own complete_fn per call.
+    """
+
+    def __init__(
+        self,
+        complete_fn: Callable[[str, str], str],
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        rate_per_second: float = DEFAULT_RATE_PER_SECOND,
+        burst: int = DEFAULT_BURST,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        timeout: float = DEFAULT_TIMEOUT,
+        is_retryable: Callable[[Exception], bool] = is_transient_error,
+    ):
+        self._complete_fn = complete_fn
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self._is_retryable = is_retryable
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._bucket = TokenBucket(rate_per_second, burst)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="cortex")
+        self._stats = {'calls': 0, 'retries': 0, 'timeouts': 0, 'failures': 0}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="cortex-loop", daemon=True)
+        self._thread.start()
+
+    async def _attempt(self, prompt: str, model: str, complete_fn: Callable[[str, str], str]) -> str:
+        await self._bucket.acquire()
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            call = loop.run_in_executor(self._executor, complete_fn, prompt, model)
+            # On timeout only the wait is cancelled: the blocking call keeps its worker thread (and its
+            # connection) until the statement returns, so the executor still bounds calls in flight
+            return await asyncio.wait_for(call, self.timeout)
+
+    async def complete(self, prompt: str, model: str, complete_fn: Optional[Callable[[str, str], str]] = None) -> str:
+        self._stats['calls'] += 1
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self._attempt(prompt, model, complete_fn or self._complete_fn)
+            except Exception as e:
+                # A timed-out completion is still running on the warehouse, so it is never retried:
+                # a retry would start a second copy of the same statement next to the first
+                timed_out = isinstance(e, asyncio.TimeoutError)
+                if timed_out:
+                    self._stats['timeouts'] += 1
+                if timed_out or attempt == self.max_retries or not self._is_retryable(e):
+                    self._stats['failures'] += 1
+                    raise
+                # Exponential backoff with full jitter
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                self._stats['retries'] += 1
+                logger.warning(f"Cortex call failed ({str(e) or type(e).__name__}); retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def complete_many(self, prompts: List[str], model: str) -> list:
+        # Failed prompts come back as their exception so one failure does not sink the batch
+        return await asyncio.gather(*(self.complete(prompt, model) for prompt in prompts), return_exceptions=True)
+
+    async def race(self, prompt: str, models: List[str], accept: Callable[[str], bool] = lambda response: True,
+                   on_result: Optional[Callable] = None) -> Tuple[str, str]:
+        # Sends the prompt to every model at once; the first accepted response wins and the others are cancelled.
+        # Cancelling stops waiting on (and retrying) the slower calls; a completion already running on a worker
+        # thread finishes there and is discarded. Without an accepted response, the first response is returned.
+        # on_result(model, response, error, latency, accepted) is called for every call that finishes
+        started = time.monotonic()
+        attempts = {asyncio.ensure_future(self.complete(prompt, model)): model for model in models}
+        pending = set(attempts)
+        fallback, last_error = None, None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    model = attempts[attempt]
+                    error = attempt.exception()
+                    response = None if error else attempt.result()
+                    accepted = error is None and accept(response)
+                    if on_result:
+                        on_result(model, response, error, time.monotonic() - started, accepted)
+                    if accepted:
+                        return model, response
+                    if error is not None:
+                        last_error = error
+                    elif fallback is None:
+                        fallback = (model, response)
+        finally:
+            for attempt in pending:
+                attempt.cancel()
+            if pending:
+                logger.info(f"Cancelled {len(pending)} slower completion(s).")
+        if fallback is not None:
+            return fallback
+        raise last_error
+
+    def race_sync(self, prompt: str, models: List[str], accept: Callable[[str], bool] = lambda response: True,
+                  on_result: Optional[Callable] = None) -> Tuple[str, str]:
+        return asyncio.run_coroutine_threadsafe(self.race(prompt, models, accept, on_result), self._loop).result()
+
+    def complete_sync(self, prompt: str, model: str, timeout: Optional[float] = None,
+                      complete_fn: Optional[Callable[[str, str], str]] = None) -> str:
+        # Blocking entry point for the Streamlit script thread and worker threads
+        future = asyncio.run_coroutine_threadsafe(self.complete(prompt, model, complete_fn), self._loop)
+        return future.result(timeout)
+
+    def complete_many_sync(self, prompts: List[str], model: str) -> list:
+        return asyncio.run_coroutine_threadsafe(self.complete_many(prompts, model), self._loop).result()
+
+    def stats(self) -> dict:
+        return dict(self._stats)
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._executor.shutdown(wait=False)
+
+
+# Function to stream a completion from the Cortex REST API, yielding text as it is generated
+# host and token come from an open connection (conn.host, conn.rest.token)
+def stream_complete(host: str, token: str, prompt: str, model: str, timeout: float = DEFAULT_TIMEOUT) -> Iterator[str]:
+    response = requests.post(
+        f"https://{host}{CORTEX_COMPLETE_PATH}",
+        json={'model': model, 'messages': [{'role': 'user', 'content': prompt}], 'stream': True},
+        headers={
+            'Authorization': f'Snowflake Token="{token}"',
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream',
+        },
+        stream=True,
+        timeout=timeout,
+    )
+    with response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            # Server-sent events: "data: {json}" lines, terminated by "data: [DONE]"
+            if not line or not line.startswith("data:"):
+                continue
+            payload = line[len("data:"):].strip()
+            if payload == "[DONE]":
+                return
+            for choice in json.loads(payload).get('choices', []):
+                delta = choice.get('delta', {})
+                text = delta.get('content') or delta.get('text')
+                if text:
+                    yield text
+
+
+# Function to replay a finished completion as a stream of word-sized chunks (local stand-in for streaming)
+def iter_text_chunks(text: str) -> Iterator[str]:
+    for match in re.finditer(r"\s*\S+", text):
+        yield match.group(0)
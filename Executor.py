@@ -0,0 +1,63 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+import pandas as pd
+
+from Compare import ResultFingerprint, fingerprint_cursor
+from Fetch import fetch_dataframe
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueryExecution:
+    query: str
+    query_id: Optional[str]
+    result: Optional[pd.DataFrame]
+    elapsed: float  # Client-side wall clock seconds, including fetch
+    fingerprint: Optional[ResultFingerprint] = None
+    columns: Optional[List[str]] = None
+
+
+# Ways run_query can consume a result
+RESULT_MODES = ("dataframe", "fingerprint", "none")
+
+
+# Function to run one query on its own pooled connection and capture its query ID
+# result_mode: "dataframe" fetches the result, "fingerprint" streams it into a ResultFingerprint,
+# "none" leaves it on the server (it stays readable through RESULT_SCAN on the query ID)
+def run_query(get_connection: Callable, query: str, result_mode: str = "dataframe") -> QueryExecution:
+    if result_mode not in RESULT_MODES:
+        raise ValueError(f"Unknown result mode: {result_mode}")
+    result = None
+    result_fingerprint = None
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        try:
+            start_time = time.perf_counter()
+            cursor.execute(query)
+            columns = [column[0] for column in cursor.description]
+            if result_mode == "fingerprint":
+                result_fingerprint = fingerprint_cursor(cursor)
+            elif result_mode == "dataframe":
+                result = fetch_dataframe(cursor)
+            elapsed = time.perf_counter() - start_time
+            query_id = getattr(cursor, "sfqid", None)
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+    logger.info(f"Query {query_id} finished in {elapsed:.3f} seconds")
+    return QueryExecution(query, query_id, result, elapsed, result_fingerprint, columns)
+
+
+# Function to run several queries in parallel, one connection per query
+def execute_queries_concurrently(get_connection: Callable, queries: List[str], max_workers: Optional[int] = None, result_mode: str = "dataframe") -> List[QueryExecution]:
+    logger.info(f"Executing {len(queries)} queries concurrently.")
+    with ThreadPoolExecutor(max_workers=max_workers or len(queries)) as executor:
+        futures = [executor.submit(run_query, get_connection, query, result_mode) for query in queries]
+        return [future.result() for future in futures]
@@ -0,0 +1,124 @@
+import json
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+# Relative change in estimated cost that counts as a clear improvement or regression
+DEFAULT_MARGIN = 0.2
+
+# Relative weight of plan operators in the operator cost; anything unlisted weighs 1
+OPERATOR_WEIGHTS = {
+    'CartesianJoin': 20,
+    'InnerJoin': 4,
+    'LeftOuterJoin': 4,
+    'RightOuterJoin': 4,
+    'FullOuterJoin': 5,
+    'SemiJoin': 3,
+    'AntiJoin': 3,
+    'Sort': 3,
+    'SortWithLimit': 2,
+    'WindowFunction': 3,
+    'Aggregate': 2,
+    'GroupingSets': 3,
+    'Flatten': 2,
+    'Result': 0,
+}
+
+VERDICTS = ("better", "worse", "ambiguous")
+
+
+@dataclass
+class PlanCost:
+    partitions_total: int = 0
+    partitions_assigned: int = 0
+    bytes_assigned: int = 0
+    operators: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def joins(self) -> int:
+        return sum(count for operation, count in self.operators.items() if operation.endswith("Join"))
+
+    @property
+    def operator_cost(self) -> int:
+        return sum(OPERATOR_WEIGHTS.get(operation, 1) * count for operation, count in self.operators.items())
+
+
+@dataclass
+class PlanComparison:
+    original: PlanCost
+    optimized: PlanCost
+    verdict: str
+    reason: str
+
+
+# Function to turn the JSON document returned by EXPLAIN USING JSON into a PlanCost
+def parse_plan(plan) -> PlanCost:
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    global_stats = plan.get('GlobalStats', {})
+    operators = Counter(
+        operation['operation']
+        for step in plan.get('Operations', [])
+        for operation in step
+        if 'operation' in operation
+    )
+    return PlanCost(
+        partitions_total=global_stats.get('partitionsTotal', 0),
+        partitions_assigned=global_stats.get('partitionsAssigned', 0),
+        bytes_assigned=global_stats.get('bytesAssigned', 0),
+        operators=dict(operators),
+    )
+
+
+# Function to compile a query and fetch its plan without executing it (no warehouse time is used)
+def explain_query(get_connection: Callable, query: str) -> PlanCost:
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        try:
+            # The statement itself cannot be a bind parameter; EXPLAIN only compiles it
+            cursor.execute(f"EXPLAIN USING JSON {query.strip().rstrip(';')}")
+            return parse_plan(cursor.fetchone()[0])
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+
+
+def _relative_change(original: float, optimized: float) -> float:
+    if original == optimized:
+        return 0.0
+    return (optimized - original) / max(original, 1)
+
+
+# Function to judge two plans: bytes scanned dominate, operator cost breaks ties
+def compare_plans(original: PlanCost, optimized: PlanCost, margin: float = DEFAULT_MARGIN) -> PlanComparison:
+    if optimized.operators.get('CartesianJoin', 0) > original.operators.get('CartesianJoin', 0):
+        return PlanComparison(original, optimized, "worse", "the optimized plan adds a cartesian join")
+
+    bytes_change = _relative_change(original.bytes_assigned, optimized.bytes_assigned)
+    if bytes_change <= -margin:
+        return PlanComparison(original, optimized, "better", f"scans {-bytes_change:.0%} fewer bytes")
+    if bytes_change >= margin:
+        return PlanComparison(original, optimized, "worse", f"scans {bytes_change:.0%} more bytes")
+
+    operator_change = _relative_change(original.operator_cost, optimized.operator_cost)
+    if operator_change <= -margin and optimized.partitions_assigned <= original.partitions_assigned:
+        return PlanComparison(original, optimized, "better", f"similar scan, {-operator_change:.0%} lower operator cost")
+    if operator_change >= margin and optimized.partitions_assigned >= original.partitions_assigned:
+        return PlanComparison(original, optimized, "worse", f"similar scan, {operator_change:.0%} higher operator cost")
+    return PlanComparison(original, optimized, "ambiguous", "plans are too close to call without executing")
+
+
+# Function to explain both queries in parallel and compare the estimates
+def compare_query_plans(get_connection: Callable, original_query: str, optimized_query: str,
+                        margin: float = DEFAULT_MARGIN) -> PlanComparison:
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        original, optimized = executor.map(lambda query: explain_query(get_connection, query), [original_query, optimized_query])
+    comparison = compare_plans(original, optimized, margin)
+    logger.info(f"Plan comparison: {comparison.verdict} ({comparison.reason})")
+    return comparison
@@ -1,48 +1,183 @@
+import json
 import re
 
+from Fetch import read_arrow
+
+# Words that mark the part of a response holding the optimized code
+TRIGGER_PATTERN = re.compile(r"\boptimise\b|\boptimized\b|\boptimisation\b|\boptimization\b", re.IGNORECASE)
+# Section headers of the Prompt.py output format, e.g. "-- Optimized Query" (also as markdown headings/bold)
+SECTION_PATTERN = re.compile(
+    r"^\s*(?:--|#+|\*\*)?\s*(original query|optimi[sz]ed query|explanation of changes|verification statement)\b[\s:*]*$",
+    re.IGNORECASE,
+)
+SECTION_NAMES = {
+    'original query': 'original',
+    'optimized query': 'optimized',
+    'optimised query': 'optimized',
+    'explanation of changes': 'explanation',
+    'verification statement': 'verification',
+}
+FENCE = "```"
+
+
+class FenceParser:
+    """Single-pass parser for LLM responses, fed the whole text or chunk by chunk as it streams.
+
+    Collects fenced code blocks (```sql, ```python or unlabelled) and the Prompt.py output
+    sections (original, optimized, explanation, verification), whether or not they sit inside a fence.
+    A section runs until the next section header, or until a fence closes inside it, so prose after
+    a fenced section's code is not taken for part of it.
+    """
+
+    def __init__(self):
+        self.blocks = []  # (language, code, follows_trigger) in order of appearance
+        self.sections = {}
+        self._partial = ""
+        self._fence_language = None  # Language of the open fence, None outside fences
+        self._block_lines = []
+        self._section = None
+        self._trigger_seen = False
+
+    def feed(self, chunk: str) -> list:
+        # Returns the code blocks completed by this chunk
+        completed = len(self.blocks)
+        lines = (self._partial + chunk).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._consume_line(line)
+        return self.blocks[completed:]
+
+    def close(self) -> "FenceParser":
+        # Flush the last line and any fence left open by a truncated response
+        if self._partial:
+            self._consume_line(self._partial)
+            self._partial = ""
+        if self._fence_language is not None:
+            self._end_block()
+        for name, lines in self.sections.items():
+            self.sections[name] = "\n".join(lines).strip() if isinstance(lines, list) else lines
+        return self
+
+    def _consume_line(self, line: str):
+        if self._fence_language is None:
+            fence_start = line.find(FENCE)
+            if fence_start != -1:
+                self._note_text(line[:fence_start])
+                rest = line[fence_start + len(FENCE):]
+                language, _, inline_code = rest.partition(" ")
+                self._fence_language = language.strip().lower()
+                self._block_lines = []
+                if inline_code.strip():
+                    self._consume_line(inline_code)
+                return
+            self._note_text(line)
+            return
+
+        fence_end = line.find(FENCE)
+        if fence_end != -1:
+            if line[:fence_end].strip():
+                self._add_code_line(line[:fence_end])
+            self._end_block()
+            self._note_text(line[fence_end + len(FENCE):])
+            return
+        self._add_code_line(line)
+
+    def _note_text(self, text: str):
+        # Prose outside fences: may open a section or mention an optimization
+        if not text.strip():
+            return
+        if self._switch_section(text):
+            return
+        if TRIGGER_PATTERN.search(text):
+            self._trigger_seen = True
+        if self._section:
+            self.sections[self._section].append(text)
+
+    def _add_code_line(self, line: str):
+        if self._switch_section(line):
+            return
+        self._block_lines.append(line)
+        if self._section:
+            self.sections[self._section].append(line)
+
+    def _switch_section(self, line: str) -> bool:
+        match = SECTION_PATTERN.match(line)
+        if not match:
+            return False
+        self._section = SECTION_NAMES[match.group(1).lower()]
+        self.sections[self._section] = []
+        if self._section == 'optimized':
+            self._trigger_seen = True
+        return True
+
+    def _end_block(self):
+        code = "\n".join(self._block_lines).strip()
+        if code:
+            self.blocks.append((self._fence_language, code, self._trigger_seen))
+        self._fence_language = None
+        self._block_lines = []
+        self._section = None
+
+    def optimized_code(self):
+        # The "-- Optimized Query" section wins; otherwise the first block after an optimization mention,
+        # preferring SQL or unlabelled blocks over other languages
+        if self.sections.get('optimized'):
+            return self.sections['optimized']
+        candidates = [block for block in self.blocks if block[2]]
+        for language, code, _ in candidates:
+            if language in ("sql", ""):
+                return code
+        return candidates[0][1] if candidates else None
+
+
+# Function to parse a complete response in one pass
+def parse_response(text: str) -> FenceParser:
+    parser = FenceParser()
+    parser.feed(text)
+    return parser.close()
+
+
+# Function to pass a streamed response through unchanged while feeding it to a parser
+def tee_to_parser(stream, parser: FenceParser):
+    for chunk in stream:
+        parser.feed(chunk)
+        yield chunk
+
+
 def extract_code(code):
-    # Search for words like 'optimise', 'optimized', 'optimisation', etc.
-    trigger_words = re.search(r"\boptimise\b|\boptimized\b|\boptimisation\b|\boptimization\b", code, re.IGNORECASE)
-    
-    if trigger_words:
-        # Extract the part of the text that comes after the trigger word
-        code_after_trigger = code[trigger_words.end():]
-        
-        if "```python" in code_after_trigger:
-            try:
-                # Extract the first Python code block after the trigger word
-                code = re.findall(r"```python(.*?)```", code_after_trigger, re.DOTALL)[0].strip()
-            except:
-                # Handle cases where the code block is not properly closed
-                code = re.findall(r"```python(.*?)$", code_after_trigger, re.DOTALL)[0].strip()
-        elif "```" in code_after_trigger:
-            try:
-                # Extract the first general code block after the trigger word
-                code = re.findall(r"```(.*?)```", code_after_trigger, re.DOTALL)[0].strip()
-            except:
-                start = code_after_trigger.find("```")
-                code = code_after_trigger[start+3:].strip()
-        return code
-    else:
-        # If no trigger words are found, return None or an empty string
-        return None
+    # Optimized code from the response, or None when there is none
+    return parse_response(code).optimized_code()
+
+
+# Function to get the SQL to run from a completion: the optimized section or block, else the first
+# SQL/unlabelled block, else the text itself
+def extract_sql(response: str) -> str:
+    parser = parse_response(response)
+    optimized = parser.optimized_code()
+    if optimized:
+        return optimized
+    for language, code, _ in parser.blocks:
+        if language in ("sql", ""):
+            return code
+    return response.strip()
 
 
 # Function to use Snowflake Cortex for inference with system message
 def cortex_inference(prompt: str, user_query: str) -> str:
     logger.info(f"Sending prompt to Snowflake Cortex: {prompt}")
     
-    # Include the system message along with the user input
-    query = f"""
+    # Include the system message along with the user input; the messages are bound as one JSON parameter
+    messages = [
+        {'role': 'system', 'content': system_message},
+        {'role': 'user', 'content': user_query}
+    ]
+    query = """
         SELECT SNOWFLAKE.CORTEX.COMPLETE(
             'snowflake-arctic',
-            [
-                {{'role': 'system', 'content': '{system_message}'}},
-                {{'role': 'user', 'content': '{user_query}'}}
-            ], 
-            {{}}
+            PARSE_JSON(?)::ARRAY,
+            {}
         ) as response;
     """
     conn = get_snowflake_connection()
-    result = pd.read_sql(query, conn)
+    result = read_arrow(query, conn, params=(json.dumps(messages),))
     return result.iloc[0, 0]
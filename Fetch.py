@@ -0,0 +1,100 @@
+import logging
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Rows per batch when a cursor cannot stream Arrow batches itself
+FALLBACK_BATCH_SIZE = 100000
+
+
+def _nullable_types_mapper():
+    import pyarrow as pa
+
+    return {
+        pa.int8(): pd.Int64Dtype(),
+        pa.int16(): pd.Int64Dtype(),
+        pa.int32(): pd.Int64Dtype(),
+        pa.int64(): pd.Int64Dtype(),
+        pa.bool_(): pd.BooleanDtype(),
+        pa.float32(): pd.Float64Dtype(),
+        pa.float64(): pd.Float64Dtype(),
+        pa.string(): pd.StringDtype(),
+    }.get
+
+
+def _supports_arrow(cursor) -> bool:
+    return hasattr(cursor, "fetch_arrow_batches")
+
+
+# Function to convert an Arrow table to pandas, pruning columns before conversion
+# nullable=True gives dtypes that do not depend on whether a batch happens to contain NULLs
+def arrow_to_pandas(table, columns: Optional[List[str]] = None, dtypes: Optional[Dict[str, str]] = None,
+                    nullable: bool = False) -> pd.DataFrame:
+    if columns is not None:
+        table = table.select(columns)
+    df = table.to_pandas(types_mapper=_nullable_types_mapper() if nullable else None)
+    return df.astype(dtypes) if dtypes else df
+
+
+def _rows_to_pandas(rows: list, names: List[str], columns: Optional[List[str]], dtypes: Optional[Dict[str, str]],
+                    nullable: bool) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=names)
+    if columns is not None:
+        df = df[columns]
+    if nullable:
+        df = df.convert_dtypes()
+    return df.astype(dtypes) if dtypes else df
+
+
+# Function to stream an executed cursor's result as DataFrame batches
+# Uses the connector's Arrow batches when available, otherwise fetchmany on the DBAPI cursor
+def iter_cursor_batches(cursor, columns: Optional[List[str]] = None, dtypes: Optional[Dict[str, str]] = None,
+                        nullable: bool = False, batch_size: int = FALLBACK_BATCH_SIZE) -> Iterator[pd.DataFrame]:
+    if _supports_arrow(cursor):
+        for table in cursor.fetch_arrow_batches():
+            yield arrow_to_pandas(table, columns, dtypes, nullable)
+        return
+    names = [column[0] for column in cursor.description]
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield _rows_to_pandas(rows, names, columns, dtypes, nullable)
+
+
+# Function to fetch an executed cursor's whole result as one DataFrame
+def fetch_dataframe(cursor, columns: Optional[List[str]] = None, dtypes: Optional[Dict[str, str]] = None,
+                    nullable: bool = False) -> pd.DataFrame:
+    names = [column[0] for column in cursor.description]
+    if _supports_arrow(cursor):
+        table = cursor.fetch_arrow_all()
+        if table is not None:
+            return arrow_to_pandas(table, columns, dtypes, nullable)
+        rows = []  # The connector returns None for an empty result
+    else:
+        rows = cursor.fetchall()
+    return _rows_to_pandas(rows, names, columns, dtypes, nullable)
+
+
+# Drop-in replacement for pd.read_sql(query, conn, params=...) that fetches through Arrow
+def read_arrow(query: str, conn, params=None, columns: Optional[List[str]] = None,
+               dtypes: Optional[Dict[str, str]] = None, nullable: bool = False) -> pd.DataFrame:
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        return fetch_dataframe(cursor, columns, dtypes, nullable)
+    finally:
+        cursor.close()
+
+
+# Function to iterate over a large result in batches; the cursor stays open until the iterator is exhausted
+def iter_query_batches(query: str, conn, params=None, columns: Optional[List[str]] = None,
+                       dtypes: Optional[Dict[str, str]] = None, nullable: bool = False) -> Iterator[pd.DataFrame]:
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        yield from iter_cursor_batches(cursor, columns, dtypes, nullable)
+    finally:
+        cursor.close()
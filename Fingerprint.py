@@ -0,0 +1,86 @@
+import hashlib
+import re
+from collections import Counter
+from typing import List, Optional
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+from sqlglot.optimizer.normalize_identifiers import normalize_identifiers
+
+# Fallback normalization for text sqlglot cannot parse
+STRING_LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL_PATTERN = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", re.IGNORECASE)
+IN_LIST_PATTERN = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+
+
+def _is_literal(node: exp.Expression) -> bool:
+    return isinstance(node, exp.Literal) or (isinstance(node, exp.Neg) and isinstance(node.this, exp.Literal))
+
+
+def _parse(query: str) -> Optional[exp.Expression]:
+    try:
+        statements = [statement for statement in sqlglot.parse(query, read="snowflake") if statement is not None]
+    except SqlglotError:
+        return None
+    return statements[0] if len(statements) == 1 else None
+
+
+# Function to reduce a query to its shape: literals become placeholders, IN lists collapse,
+# unquoted identifiers are upper-cased and whitespace/keyword casing is canonical
+def normalize_query(query: str) -> str:
+    statement = _parse(query)
+    if statement is None:
+        text = STRING_LITERAL_PATTERN.sub("?", query)
+        text = NUMBER_LITERAL_PATTERN.sub("?", text)
+        text = IN_LIST_PATTERN.sub("IN (?)", text)
+        return re.sub(r"\s+", " ", text).strip().rstrip(";").upper()
+
+    def strip_literals(node):
+        if _is_literal(node):
+            return exp.Placeholder()
+        if isinstance(node, exp.In) and node.expressions and all(_is_literal(value) for value in node.expressions):
+            # IN lists of any length share one shape
+            node.set("expressions", [exp.Placeholder()])
+        return node
+
+    statement = normalize_identifiers(statement, dialect="snowflake").transform(strip_literals)
+    return statement.sql(dialect="snowflake")
+
+
+# Function to compute the stable fingerprint of a query's normalized shape
+def query_fingerprint(query: str) -> str:
+    return hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+
+
+def _literal_values(statement: exp.Expression) -> List[str]:
+    return [node.sql(dialect="snowflake") for node in statement.walk() if _is_literal(node) and not _is_literal(node.parent)]
+
+
+# Function to carry an optimization over to another variant of the same query by swapping literals
+# Returns None when the literals cannot be mapped one-to-one with confidence
+def adapt_optimization(original_query: str, optimized_query: str, new_query: str) -> Optional[str]:
+    original, optimized, new = _parse(original_query), _parse(optimized_query), _parse(new_query)
+    if original is None or optimized is None or new is None:
+        return None
+    old_values, new_values = _literal_values(original), _literal_values(new)
+    if len(old_values) != len(new_values):
+        return None  # e.g. IN lists of different lengths
+    mapping = {}
+    for old, value in zip(old_values, new_values):
+        if mapping.setdefault(old, value) != value:
+            return None  # One old literal would need two different replacements
+    # A literal the optimizer introduced could collide with a mapped value; only swap when counts line up
+    old_counts, optimized_counts = Counter(old_values), Counter(_literal_values(optimized))
+    if any(optimized_counts[old] not in (0, count) for old, count in old_counts.items()):
+        return None
+
+    def swap(node):
+        if _is_literal(node) and not _is_literal(node.parent):
+            value = node.sql(dialect="snowflake")
+            if value in mapping:
+                return sqlglot.parse_one(mapping[value], read="snowflake")
+        return node
+
+    return optimized.transform(swap).sql(dialect="snowflake", pretty=True)
+
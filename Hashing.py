@@ -0,0 +1,75 @@
+import datetime
+import decimal
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Hash given to every NULL (None, NaN, NaT, pd.NA) regardless of column type
+NULL_HASH = np.uint64(0x6A09E667F3BCC908)
+# Multiplier used to fold column hashes into a row hash (64-bit golden ratio)
+COMBINE_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+# Function to hash numbers so that equal values hash equally whatever their storage type
+# Whole numbers hash as int64 (1, 1.0 and Decimal('1.00') agree); other values hash as float64
+def _hash_numbers(values: pd.Series, float_decimals: Optional[int]) -> np.ndarray:
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return pd.util.hash_array(values.astype("Int64").fillna(0).to_numpy(dtype=np.int64), categorize=False)
+    numbers = pd.to_numeric(values, errors="coerce").astype("float64").to_numpy()
+    numbers = np.nan_to_num(numbers, nan=0.0)
+    if float_decimals is not None:
+        numbers = np.round(numbers, float_decimals)
+    numbers = numbers + 0.0  # Folds -0.0 into 0.0
+    with np.errstate(invalid="ignore"):
+        integral = np.isfinite(numbers) & (np.mod(numbers, 1) == 0) & (np.abs(numbers) < 2 ** 53)
+    int_hashes = pd.util.hash_array(np.where(integral, numbers, 0).astype(np.int64), categorize=False)
+    float_hashes = pd.util.hash_array(numbers, categorize=False)
+    return np.where(integral, int_hashes, float_hashes)
+
+
+# Function to hash one column with type-aware canonicalization
+def hash_column(series: pd.Series, float_decimals: Optional[int] = None) -> np.ndarray:
+    nulls = series.isna().to_numpy()
+    dtype = series.dtype
+
+    if pd.api.types.is_bool_dtype(dtype):
+        hashes = pd.util.hash_array(series.astype("boolean").fillna(False).to_numpy(dtype=np.int64), categorize=False)
+    elif pd.api.types.is_numeric_dtype(dtype):
+        hashes = _hash_numbers(series, float_decimals)
+    elif pd.api.types.is_datetime64_any_dtype(dtype):
+        hashes = _hash_timestamps(series)
+    else:
+        non_null = series[~nulls]
+        sample = non_null.iloc[0] if len(non_null) else None
+        if isinstance(sample, (decimal.Decimal, int, float, np.number)) and not isinstance(sample, bool) \
+                and not (pd.to_numeric(non_null, errors="coerce").isna()).any():
+            hashes = _hash_numbers(series, float_decimals)
+        elif isinstance(sample, (datetime.datetime, datetime.date, np.datetime64)):
+            hashes = _hash_timestamps(pd.to_datetime(series, utc=True))
+        else:
+            strings = series.astype(object).where(~nulls, "").astype(str).to_numpy(dtype=object)
+            hashes = pd.util.hash_array(strings, categorize=False)
+
+    hashes[nulls] = NULL_HASH
+    return hashes
+
+
+# Function to hash timestamps as UTC nanoseconds; naive timestamps are taken to be UTC
+def _hash_timestamps(series: pd.Series) -> np.ndarray:
+    if getattr(series.dtype, "tz", None) is not None:
+        series = series.dt.tz_convert("UTC").dt.tz_localize(None)
+    nanoseconds = series.astype("datetime64[ns]").to_numpy().view(np.int64)
+    return pd.util.hash_array(nanoseconds, categorize=False)
+
+
+# Function to hash every row of a DataFrame at once; columns are combined in sorted name order
+# Columns are read by position, so duplicate names (e.g. two joined ID columns) each count once, in their order
+def hash_rows(df: pd.DataFrame, float_decimals: Optional[int] = None) -> np.ndarray:
+    row_hashes = np.zeros(len(df), dtype=np.uint64)
+    positions = sorted(range(len(df.columns)), key=lambda position: str(df.columns[position]).upper())
+    with np.errstate(over="ignore"):
+        for position in positions:
+            row_hashes = (row_hashes ^ hash_column(df.iloc[:, position], float_decimals)) * COMBINE_MULTIPLIER
+            row_hashes ^= row_hashes >> np.uint64(29)
+    return row_hashes
@@ -0,0 +1,89 @@
+import logging
+import time
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+from Fetch import read_arrow
+
+logger = logging.getLogger(__name__)
+
+# How far back the INFORMATION_SCHEMA lookup searches, and how long to wait for new queries to appear
+DEFAULT_LOOKBACK_MINUTES = 60
+DEFAULT_MAX_WAIT = 10.0
+POLL_INTERVAL = 0.25
+
+# Millisecond columns converted to seconds in the returned stats
+TIME_COLUMNS = [
+    'total_elapsed_time',
+    'compilation_time',
+    'execution_time',
+    'queued_provisioning_time',
+    'queued_overload_time',
+]
+
+
+# Function to build the per-ID query history lookup for a batch of query IDs
+# Bind parameters: the lookback in minutes, then each query ID
+def build_query_stats_sql(query_ids: List[str]) -> str:
+    placeholders = ", ".join(["?"] * len(query_ids))
+    return f"""
+        SELECT query_id, execution_status, total_elapsed_time, compilation_time, execution_time,
+               queued_provisioning_time, queued_overload_time, bytes_scanned,
+               partitions_scanned, partitions_total, rows_produced
+        FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY(
+            END_TIME_RANGE_START => DATEADD(minute, -?, CURRENT_TIMESTAMP()),
+            RESULT_LIMIT => 10000
+        ))
+        WHERE query_id IN ({placeholders});
+    """
+
+
+# Function to turn one history row into a stats dict with times in seconds
+def _row_to_stats(row: pd.Series) -> dict:
+    stats = row.to_dict()
+    for column in TIME_COLUMNS:
+        if stats.get(column) is not None:
+            stats[column] = stats[column] / 1000  # Convert to seconds
+    stats['queued_time'] = (stats.get('queued_provisioning_time') or 0) + (stats.get('queued_overload_time') or 0)
+    return stats
+
+
+# Function to fetch timing/bytes/partition stats for many query IDs in one round trip
+def get_query_stats_batch(get_connection: Callable, query_ids: List[str], max_wait: float = DEFAULT_MAX_WAIT) -> Dict[str, dict]:
+    query_ids = [query_id for query_id in dict.fromkeys(query_ids) if query_id]
+    if not query_ids:
+        return {}
+    logger.info(f"Fetching query stats for {len(query_ids)} query IDs.")
+
+    stats = {}
+    deadline = time.monotonic() + max_wait
+    wait = POLL_INTERVAL
+    conn = get_connection()
+    try:
+        while True:
+            pending = [query_id for query_id in query_ids if query_id not in stats]
+            result = read_arrow(build_query_stats_sql(pending), conn, params=[DEFAULT_LOOKBACK_MINUTES] + pending)
+            result.columns = [column.lower() for column in result.columns]
+            for _, row in result.iterrows():
+                stats[row['query_id']] = _row_to_stats(row)
+            if len(stats) == len(query_ids) or time.monotonic() + wait > deadline:
+                break
+            # Freshly finished queries can take a moment to show up in INFORMATION_SCHEMA
+            time.sleep(wait)
+            wait = min(wait * 2, 2.0)
+    finally:
+        conn.close()
+
+    missing = [query_id for query_id in query_ids if query_id not in stats]
+    if missing:
+        logger.warning(f"No query history found for query IDs: {missing}")
+    return stats
+
+
+# Function to fetch stats for a single query ID
+def get_query_stats(get_connection: Callable, query_id: str, max_wait: float = DEFAULT_MAX_WAIT) -> dict:
+    stats = get_query_stats_batch(get_connection, [query_id], max_wait=max_wait)
+    if query_id not in stats:
+        raise ValueError(f"No query history found for query ID {query_id}.")
+    return stats[query_id]
@@ -0,0 +1,111 @@
+import itertools
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Any, Callable, List, Optional
+
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+# Queue defaults
+DEFAULT_MAX_WORKERS = 8  # Jobs mostly wait on the warehouse, so threads are enough
+DEFAULT_MAX_JOBS = 200  # Finished jobs kept for polling; the oldest are forgotten beyond this
+DEFAULT_POLL_INTERVAL = 2.0  # Seconds between status checks while a job is in flight
+
+JOB_STATES = ("queued", "running", "succeeded", "failed")
+
+
+@dataclass(frozen=True)
+class Job:
+    job_id: str
+    kind: str
+    state: str
+    submitted_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self.state in ("succeeded", "failed")
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.time()) - (self.started_at or self.submitted_at)
+
+
+class JobQueue:
+    """Background worker pool with a job table, so long-running work outlives Streamlit script reruns."""
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, max_jobs: int = DEFAULT_MAX_JOBS):
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._sequence = itertools.count(1)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+
+    def _update(self, job_id: str, **changes):
+        with self._lock:
+            self._jobs[job_id] = replace(self._jobs[job_id], **changes)
+
+    def _run(self, job_id: str, fn: Callable, args: tuple, kwargs: dict):
+        self._update(job_id, state="running", started_at=time.time())
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            self._update(job_id, state="failed", finished_at=time.time(), error=str(e))
+        else:
+            logger.info(f"Job {job_id} succeeded.")
+            self._update(job_id, state="succeeded", finished_at=time.time(), result=result)
+
+    def _forget_finished(self):
+        # Only finished jobs are forgotten; queued and running ones are always kept
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done]:
+            if len(self._jobs) <= self.max_jobs:
+                break
+            del self._jobs[job_id]
+
+    # Function to queue fn(*args, **kwargs) and return the ID to poll it by
+    def submit(self, kind: str, fn: Callable, *args, **kwargs) -> str:
+        job_id = f"{kind}-{next(self._sequence)}-{uuid.uuid4().hex[:6]}"
+        with self._lock:
+            self._jobs[job_id] = Job(job_id, kind, "queued", time.time())
+            self._forget_finished()
+        self._executor.submit(self._run, job_id, fn, args, kwargs)
+        logger.info(f"Submitted job {job_id}.")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, kind: Optional[str] = None) -> List[Job]:
+        with self._lock:
+            return [job for job in self._jobs.values() if kind is None or job.kind == kind]
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+# Job queue shared by every session of this Streamlit server
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    queue_settings = st.secrets.get("job_queue", {})
+    return JobQueue(
+        max_workers=queue_settings.get("max_workers", DEFAULT_MAX_WORKERS),
+        max_jobs=queue_settings.get("max_jobs", DEFAULT_MAX_JOBS),
+    )
+
+
+# Function to describe a job that is still in flight
+def job_status_message(job: Job) -> str:
+    if job.state == "queued":
+        return f"Job {job.job_id} is queued ({job.elapsed:.0f}s)..."
+    return f"Job {job.job_id} is running ({job.elapsed:.0f}s)..."
@@ -0,0 +1,164 @@
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+
+logger = logging.getLogger(__name__)
+
+# Column names that usually hold dates or timestamps
+TEMPORAL_NAME_PATTERN = re.compile(r"(date|time|_at$|_ts$|^ts$|day|month|year|period)", re.IGNORECASE)
+# String literals that look like dates or timestamps
+TEMPORAL_LITERAL_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}")
+TEMPORAL_TYPES = {
+    exp.DataType.Type.DATE,
+    exp.DataType.Type.DATETIME,
+    exp.DataType.Type.TIMESTAMP,
+    exp.DataType.Type.TIMESTAMPTZ,
+    exp.DataType.Type.TIMESTAMPLTZ,
+    exp.DataType.Type.TIMESTAMPNTZ,
+}
+
+
+@dataclass
+class LintFinding:
+    rule: str
+    message: str
+    snippet: str
+
+
+@dataclass
+class LintReport:
+    findings: List[LintFinding] = field(default_factory=list)
+    ambiguous: bool = False  # The query could not be analysed with confidence
+    reason: str = ""
+
+    @property
+    def needs_llm_check(self) -> bool:
+        return self.ambiguous or bool(self.findings)
+
+    def describe(self) -> str:
+        lines = [f"- [{finding.rule}] {finding.message}: {finding.snippet}" for finding in self.findings]
+        if self.ambiguous:
+            lines.append(f"- The query could not be fully analysed locally ({self.reason}).")
+        return "\n".join(lines)
+
+
+# Registry of lint rules; each takes a parsed statement and yields findings
+LINT_RULES: Dict[str, Callable[[exp.Expression], List[LintFinding]]] = {}
+
+
+def lint_rule(name: str):
+    def register(func):
+        LINT_RULES[name] = func
+        return func
+    return register
+
+
+def _snippet(node: exp.Expression) -> str:
+    text = node.sql(dialect="snowflake")
+    return text if len(text) <= 120 else text[:117] + "..."
+
+
+@lint_rule("not-in-null")
+def check_not_in_with_nulls(statement: exp.Expression) -> List[LintFinding]:
+    findings = []
+    for not_node in statement.find_all(exp.Not):
+        in_node = not_node.this
+        if not isinstance(in_node, exp.In):
+            continue
+        if in_node.args.get("query") is not None:
+            findings.append(LintFinding(
+                "not-in-null",
+                "NOT IN over a subquery returns no rows if the subquery yields a NULL; prefer NOT EXISTS",
+                _snippet(not_node),
+            ))
+        elif any(isinstance(value, exp.Null) for value in in_node.expressions):
+            findings.append(LintFinding("not-in-null", "NOT IN list contains NULL, so it never matches", _snippet(not_node)))
+    # Some dialect paths parse "x NOT IN (SELECT ...)" as "x <> ALL (SELECT ...)"
+    for neq in statement.find_all(exp.NEQ):
+        if isinstance(neq.expression, exp.All):
+            findings.append(LintFinding(
+                "not-in-null",
+                "NOT IN over a subquery returns no rows if the subquery yields a NULL; prefer NOT EXISTS",
+                _snippet(neq),
+            ))
+    return findings
+
+
+@lint_rule("union-distinct")
+def check_union(statement: exp.Expression) -> List[LintFinding]:
+    return [
+        LintFinding("union-distinct", "UNION removes duplicates (an extra sort/aggregate); use UNION ALL if duplicates are impossible or wanted", _snippet(union.expression))
+        for union in statement.find_all(exp.Union)
+        if union.args.get("distinct")
+    ]
+
+
+def _is_temporal(node: exp.Expression) -> bool:
+    if isinstance(node, exp.Column):
+        return bool(TEMPORAL_NAME_PATTERN.search(node.name))
+    if isinstance(node, exp.Literal) and node.is_string:
+        return bool(TEMPORAL_LITERAL_PATTERN.match(node.this))
+    if isinstance(node, exp.Cast):
+        return node.to.this in TEMPORAL_TYPES
+    return isinstance(node, (exp.CurrentDate, exp.CurrentTimestamp, exp.DateAdd, exp.DateSub, exp.TsOrDsToDate))
+
+
+@lint_rule("between-range")
+def check_between(statement: exp.Expression) -> List[LintFinding]:
+    return [
+        LintFinding("between-range", "BETWEEN includes both bounds; for date/time ranges the upper bound is usually exclusive (>= low AND < high)", _snippet(between))
+        for between in statement.find_all(exp.Between)
+        if any(_is_temporal(node) for node in (between.this, between.args.get("low"), between.args.get("high")) if node is not None)
+    ]
+
+
+@lint_rule("join-columns")
+def check_join_columns(statement: exp.Expression) -> List[LintFinding]:
+    findings = []
+    for join in statement.find_all(exp.Join):
+        condition = join.args.get("on")
+        if condition is None:
+            continue
+        for eq in condition.find_all(exp.EQ):
+            left, right = eq.this, eq.expression
+            if isinstance(left, exp.Column) and isinstance(right, exp.Column) and left.table and left.table == right.table:
+                findings.append(LintFinding("join-columns", "join condition compares two columns of the same table", _snippet(eq)))
+    return findings
+
+
+@lint_rule("literal-type-mismatch")
+def check_literal_types(statement: exp.Expression) -> List[LintFinding]:
+    # A quoted number compared with an unquoted one forces an implicit cast
+    findings = []
+    for comparison in statement.find_all(exp.EQ, exp.NEQ, exp.GT, exp.GTE, exp.LT, exp.LTE):
+        left, right = comparison.this, comparison.expression
+        if isinstance(left, exp.Literal) and isinstance(right, exp.Literal) and left.is_string != right.is_string:
+            findings.append(LintFinding("literal-type-mismatch", "string literal compared with a number", _snippet(comparison)))
+    return findings
+
+
+# Function to run every local rule over a query; ambiguous results should be escalated to Cortex
+def lint_query(query: str) -> LintReport:
+    try:
+        statements = [statement for statement in sqlglot.parse(query, read="snowflake") if statement is not None]
+    except SqlglotError as e:
+        return LintReport(ambiguous=True, reason=f"parse error: {str(e).splitlines()[0]}")
+    if len(statements) != 1:
+        return LintReport(ambiguous=True, reason=f"expected one statement, found {len(statements)}")
+    statement = statements[0]
+    if not isinstance(statement, exp.Query):
+        return LintReport(ambiguous=True, reason=f"not a SELECT query ({type(statement).__name__})")
+    if any(isinstance(node, exp.Anonymous) for node in statement.find_all(exp.Anonymous)):
+        # Functions the parser does not know cannot be checked for argument counts or types
+        return LintReport(ambiguous=True, reason="uses functions unknown to the local parser")
+
+    report = LintReport()
+    for name, rule in LINT_RULES.items():
+        report.findings.extend(rule(statement))
+    logger.info(f"Local lint found {len(report.findings)} issue(s).")
+    return report
@@ -0,0 +1,287 @@
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Pool defaults, overridable per pool
+DEFAULT_MIN_SIZE = 1
+DEFAULT_MAX_SIZE = 8
+DEFAULT_IDLE_TIMEOUT = 300.0  # Seconds an idle connection is kept before eviction
+DEFAULT_ACQUIRE_TIMEOUT = 30.0  # Seconds to wait for a free connection
+DEFAULT_HEALTH_CHECK_INTERVAL = 60.0  # Idle seconds after which a connection is pinged before reuse
+
+
+# Function run when a pooled connection is garbage-collected without being closed
+def _release_abandoned(pool: "SnowflakeConnectionPool", raw):
+    logger.warning("Pooled connection was garbage-collected without close(); returning it to the pool.")
+    pool.release(raw)
+
+
+class PooledConnection:
+    """Connection handed out by the pool; close() returns it instead of closing it."""
+
+    def __init__(self, pool: "SnowflakeConnectionPool", raw):
+        self._pool = pool
+        self._raw = raw
+        self._released = False
+        # Fallback for callers that drop the connection without closing it
+        self._finalizer = weakref.finalize(self, _release_abandoned, pool, raw)
+
+    @property
+    def raw(self):
+        return self._raw
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._finalizer.detach()
+            self._pool.release(self._raw)
+
+    def discard(self):
+        # Drop a connection known to be broken instead of returning it to the pool
+        if not self._released:
+            self._released = True
+            self._finalizer.detach()
+            self._pool.discard(self._raw)
+
+    def __getattr__(self, name):
+        if self._released:
+            raise RuntimeError("Connection has already been returned to the pool.")
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SnowflakeConnectionPool:
+    """Bounded, thread-safe pool of Snowflake connections with idle eviction and health checks."""
+
+    def __init__(
+        self,
+        connect: Callable,
+        min_size: int = DEFAULT_MIN_SIZE,
+        max_size: int = DEFAULT_MAX_SIZE,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        acquire_timeout: float = DEFAULT_ACQUIRE_TIMEOUT,
+        health_check_interval: float = DEFAULT_HEALTH_CHECK_INTERVAL,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool bounds: min_size={min_size}, max_size={max_size}")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+        self._idle = deque()  # (raw connection, last used timestamp), most recently used on the right
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._created = 0
+        self._reused = 0
+        for _ in range(min_size):
+            self._size += 1
+            self._idle.append((self._open(), time.monotonic()))
+
+    def _open(self):
+        # The caller has already reserved a slot in self._size
+        logger.info("Opening new Snowflake connection for the pool.")
+        try:
+            raw = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._created += 1
+        return raw
+
+    def _close_raw(self, raw):
+        try:
+            raw.close()
+        except Exception as e:
+            logger.warning(f"Error closing pooled connection: {str(e)}")
+
+    def _is_healthy(self, raw) -> bool:
+        is_closed = getattr(raw, "is_closed", None)
+        if callable(is_closed) and is_closed():
+            return False
+        try:
+            cursor = raw.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled connection failed health check: {str(e)}")
+            return False
+
+    def _evict_idle(self, now: float) -> list:
+        # Called with the lock held; returns connections to close outside of it
+        evicted = []
+        while self._idle and self._size > self.min_size:
+            raw, last_used = self._idle[0]
+            if now - last_used < self.idle_timeout:
+                break
+            self._idle.popleft()
+            self._size -= 1
+            evicted.append(raw)
+        return evicted
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledConnection:
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            candidate = None
+            reserved = False
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed.")
+                evicted = self._evict_idle(time.monotonic())
+                if self._idle:
+                    candidate = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                    reserved = True
+                elif not evicted:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"Timed out after {timeout}s waiting for a pooled connection.")
+                    self._cond.wait(remaining)
+                    continue
+            for raw in evicted:
+                self._close_raw(raw)
+
+            if reserved:
+                return PooledConnection(self, self._open())
+            if candidate is None:
+                continue
+
+            raw, last_used = candidate
+            if time.monotonic() - last_used >= self.health_check_interval and not self._is_healthy(raw):
+                self.discard(raw)
+                continue
+            with self._cond:
+                self._reused += 1
+            return PooledConnection(self, raw)
+
+    def release(self, raw):
+        is_closed = getattr(raw, "is_closed", None)
+        if callable(is_closed) and is_closed():
+            self.discard(raw)
+            return
+        with self._cond:
+            if not self._closed:
+                self._idle.append((raw, time.monotonic()))
+                self._cond.notify()
+                return
+            self._size -= 1
+        self._close_raw(raw)
+
+    def discard(self, raw):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+        self._close_raw(raw)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def close_all(self):
+        with self._cond:
+            self._closed = True
+            idle = [raw for raw, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for raw in idle:
+            self._close_raw(raw)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'created': self._created,
+                'reused': self._reused,
+            }
+
+
+# Local stand-in for snowflake.connector so the pool can be exercised without a real account
+class LocalCursor:
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+        self.sfqid = None
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql: str, params=None):
+        self.sfqid = str(uuid.uuid4())
+        self._cursor.execute(sql, params or ())
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size: int = 1):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class LocalConnection:
+    def __init__(self, database: str = ":memory:"):
+        self._conn = sqlite3.connect(database, check_same_thread=False)
+        self._closed = False
+
+    def cursor(self) -> LocalCursor:
+        return LocalCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def is_closed(self) -> bool:
+        return self._closed
+
+    def close(self):
+        self._closed = True
+        self._conn.close()
+
+
+def connect_local(database: str = ":memory:") -> LocalConnection:
+    return LocalConnection(database)
@@ -0,0 +1,159 @@
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, Tuple
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+from sqlglot.optimizer.eliminate_subqueries import eliminate_subqueries
+
+logger = logging.getLogger(__name__)
+
+# Catalogue items from Prompt.py that are not safe to apply mechanically and stay with the LLM
+LLM_ONLY_REWRITES = (
+    "Rewrite OR conditions across different columns as UNION ALL where logically equivalent",
+    "Replace self-joins and correlated subqueries with window functions",
+    "Pre-aggregate data in CTEs before joining",
+    "Reorder JOINs so the largest tables are joined last",
+)
+
+# Cost rank of a predicate for reordering: cheap, selective predicates first
+PREDICATE_RANKS = (
+    (exp.EQ, 0),
+    (exp.Is, 1),
+    (exp.In, 2),
+    (exp.Between, 3),
+    ((exp.GT, exp.GTE, exp.LT, exp.LTE, exp.NEQ), 3),
+    ((exp.Like, exp.ILike), 5),
+)
+DEFAULT_PREDICATE_RANK = 4
+
+
+@dataclass(frozen=True)
+class RewriteResult:
+    original: str
+    sql: str
+    applied: Tuple[str, ...] = ()
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.applied)
+
+
+# Registry of rewrite rules; each takes a parsed statement and returns the (possibly new) statement
+REWRITE_RULES: Dict[str, Callable[[exp.Expression], exp.Expression]] = {}
+
+
+def rewrite_rule(name: str):
+    def register(func):
+        REWRITE_RULES[name] = func
+        return func
+    return register
+
+
+@rewrite_rule("subqueries-to-ctes")
+def subqueries_to_ctes(statement: exp.Expression) -> exp.Expression:
+    # Lifts derived tables into WITH clauses and merges duplicates; correlated subqueries are left alone
+    return eliminate_subqueries(statement)
+
+
+def _or_terms(node: exp.Expression) -> list:
+    if isinstance(node, exp.Or):
+        return _or_terms(node.this) + _or_terms(node.expression)
+    if isinstance(node, exp.Paren):
+        return _or_terms(node.this)
+    return [node]
+
+
+def _or_to_in(node: exp.Or):
+    terms = _or_terms(node)
+    if not all(isinstance(term, exp.EQ) and isinstance(term.expression, exp.Literal) for term in terms):
+        return None
+    column = terms[0].this
+    if not isinstance(column, exp.Column) or any(term.this != column for term in terms):
+        return None
+    return exp.In(this=column.copy(), expressions=[term.expression.copy() for term in terms])
+
+
+@rewrite_rule("or-to-in")
+def or_equalities_to_in(statement: exp.Expression) -> exp.Expression:
+    # col = 1 OR col = 2 OR col = 3  ->  col IN (1, 2, 3); NULL handling is identical
+    def transform(node):
+        if isinstance(node, exp.Paren) and isinstance(node.this, exp.Or):
+            # Parentheses around the disjunction are redundant once it is an IN
+            return _or_to_in(node.this) or node
+        if isinstance(node, exp.Or) and not isinstance(node.parent, (exp.Or, exp.Paren)):
+            return _or_to_in(node) or node
+        return node
+
+    return statement.transform(transform)
+
+
+def _predicate_rank(node: exp.Expression) -> int:
+    if node.find(exp.Subquery, exp.Select):
+        return 9  # Subqueries are the most expensive to evaluate
+    for kinds, rank in PREDICATE_RANKS:
+        if isinstance(node, kinds):
+            # A function call on either side defeats pruning on the column
+            return rank + (2 if node.find(exp.Func) else 0)
+    return DEFAULT_PREDICATE_RANK
+
+
+def _and_terms(node: exp.Expression) -> list:
+    if isinstance(node, exp.And):
+        return _and_terms(node.this) + _and_terms(node.expression)
+    return [node]
+
+
+@rewrite_rule("predicate-order")
+def reorder_predicates(statement: exp.Expression) -> exp.Expression:
+    # AND is commutative in SQL, so putting cheap, selective predicates first never changes results
+    for where in statement.find_all(exp.Where):
+        terms = _and_terms(where.this)
+        ordered = sorted(terms, key=_predicate_rank)  # Stable, so equal ranks keep their order
+        if ordered != terms:
+            where.set("this", exp.and_(*[term.copy() for term in ordered], copy=False))
+    return statement
+
+
+# Function to apply every deterministic rewrite to a query; cached since the output depends only on the input
+@lru_cache(maxsize=256)
+def rewrite_query(query: str) -> RewriteResult:
+    try:
+        statements = [statement for statement in sqlglot.parse(query, read="snowflake") if statement is not None]
+    except SqlglotError as e:
+        logger.info(f"Skipping local rewrites, query does not parse: {str(e).splitlines()[0]}")
+        return RewriteResult(query, query)
+    if len(statements) != 1 or not isinstance(statements[0], exp.Query):
+        return RewriteResult(query, query)
+
+    statement = statements[0]
+    applied = []
+    for name, rule in REWRITE_RULES.items():
+        try:
+            rewritten = rule(statement.copy())
+        except SqlglotError as e:
+            logger.warning(f"Rewrite rule {name} failed: {str(e)}")
+            continue
+        if rewritten != statement:
+            statement = rewritten
+            applied.append(name)
+
+    if not applied:
+        return RewriteResult(query, query)
+    logger.info(f"Applied local rewrites: {', '.join(applied)}")
+    return RewriteResult(query, statement.sql(dialect="snowflake", pretty=True), tuple(applied))
+
+
+# Function to build the optimizer prompt for whatever the local rewrites could not cover
+def build_optimize_prompt(query: str) -> str:
+    rewrite = rewrite_query(query)
+    if not rewrite.changed:
+        return f"Optimize the following query: {query}"
+    remaining = "\n".join(f"- {item}" for item in LLM_ONLY_REWRITES)
+    return f"""Optimize the following query: {rewrite.sql}
+    These rewrites have already been applied: {', '.join(rewrite.applied)}.
+    Focus on the remaining optimizations, such as:
+{remaining}
+    """
@@ -0,0 +1,162 @@
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+
+from Extraction import extract_sql
+
+logger = logging.getLogger(__name__)
+
+# Routing defaults: a small, fast model for the SQL checker and a larger one for the optimizer
+DEFAULT_TASK_MODELS = {
+    'check': 'llama3.1-8b',
+    'optimize': 'snowflake-arctic',
+}
+DEFAULT_RACE_MODELS = ('snowflake-arctic', 'llama3.1-70b')
+
+# Ledger defaults
+DEFAULT_LEDGER_PATH = ".model_ledger.sqlite"
+DEFAULT_LEDGER_WINDOW = 14 * 24 * 3600.0  # Seconds of history the routing statistics look at
+# Adaptive routing only considers models with enough calls and a high enough share of valid SQL answers
+MIN_LEDGER_CALLS = 20
+MIN_VALID_RATE = 0.9
+
+
+# Function to check that a completion contains a single SQL query that parses
+def response_has_valid_sql(response: str) -> bool:
+    try:
+        statements = sqlglot.parse(extract_sql(response), read="snowflake")
+    except SqlglotError:
+        return False
+    return len(statements) == 1 and isinstance(statements[0], exp.Query)
+
+
+@dataclass(frozen=True)
+class ModelStats:
+    model: str
+    calls: int
+    valid_rate: float  # Share of completions that contained valid SQL
+    mean_latency: float  # Seconds
+    wins: int  # Races won
+    verified_runs: int  # Optimizations that were executed and compared
+    verified_rate: Optional[float]  # Share of those whose results matched
+
+
+class ModelLedger:
+    """SQLite ledger of Cortex calls per model (latency, valid SQL, races won) and of verified outcomes."""
+
+    def __init__(self, path: str = DEFAULT_LEDGER_PATH, window: float = DEFAULT_LEDGER_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS calls (
+                model TEXT NOT NULL,
+                task TEXT NOT NULL,
+                latency REAL NOT NULL,
+                valid INTEGER NOT NULL,
+                won INTEGER,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS calls_task ON calls (task, created_at);
+            CREATE TABLE IF NOT EXISTS verifications (
+                model TEXT NOT NULL,
+                results_match INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            );
+        """)
+        self._db.commit()
+
+    # won is None for calls that were not part of a race
+    def record_call(self, model: str, task: str, latency: float, valid: bool, won: Optional[bool] = None):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO calls (model, task, latency, valid, won, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (model, task, latency, int(valid), None if won is None else int(won), time.time()),
+            )
+            self._db.commit()
+
+    def record_verification(self, model: str, results_match: bool):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO verifications (model, results_match, created_at) VALUES (?, ?, ?)",
+                (model, int(bool(results_match)), time.time()),
+            )
+            self._db.commit()
+
+    def stats(self, task: Optional[str] = None) -> List[ModelStats]:
+        since = time.time() - self.window
+        with self._lock:
+            calls = self._db.execute(
+                """SELECT model, COUNT(*), AVG(valid), AVG(latency), COALESCE(SUM(won), 0) FROM calls
+                   WHERE created_at >= ? AND (? IS NULL OR task = ?) GROUP BY model""",
+                (since, task, task),
+            ).fetchall()
+            verifications = dict(
+                (model, (count, rate)) for model, count, rate in self._db.execute(
+                    "SELECT model, COUNT(*), AVG(results_match) FROM verifications WHERE created_at >= ? GROUP BY model",
+                    (since,),
+                ).fetchall()
+            )
+        return [
+            ModelStats(model, count, valid_rate, mean_latency, wins, *verifications.get(model, (0, None)))
+            for model, count, valid_rate, mean_latency, wins in calls
+        ]
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM calls")
+            self._db.execute("DELETE FROM verifications")
+            self._db.commit()
+
+
+class ModelRouter:
+    """Picks the Cortex model(s) for each task: fixed per-task models, a race between models, or adaptive."""
+
+    def __init__(self, task_models: Optional[Dict[str, str]] = None, race_models: Sequence[str] = DEFAULT_RACE_MODELS,
+                 race_tasks: Sequence[str] = (), ledger: Optional[ModelLedger] = None, adaptive: bool = False):
+        self.task_models = dict(DEFAULT_TASK_MODELS, **(task_models or {}))
+        self.race_models = tuple(race_models)
+        self.race_tasks = tuple(race_tasks)
+        self.ledger = ledger
+        self.adaptive = adaptive
+
+    def races(self, task: str) -> bool:
+        return task in self.race_tasks and len(self.race_models) > 1
+
+    # Function to pick the model for a task; adaptive routing prefers the fastest model with a good record
+    def model_for(self, task: str) -> str:
+        model = self.task_models[task]
+        if not (self.adaptive and self.ledger):
+            return model
+        candidates = {model, *self.race_models}
+        eligible = [
+            stats for stats in self.ledger.stats(task)
+            if stats.model in candidates and stats.calls >= MIN_LEDGER_CALLS and stats.valid_rate >= MIN_VALID_RATE
+            and (stats.verified_rate is None or stats.verified_rate >= MIN_VALID_RATE)
+        ]
+        if eligible:
+            fastest = min(eligible, key=lambda stats: stats.mean_latency)
+            if fastest.model != model:
+                logger.info(f"Routing {task} to {fastest.model} ({fastest.mean_latency:.1f}s mean latency).")
+            return fastest.model
+        return model
+
+    # Function to list the models to send a task to: several when racing, otherwise one
+    def models_for(self, task: str) -> List[str]:
+        return list(self.race_models) if self.races(task) else [self.model_for(task)]
+
+    def record_call(self, model: str, task: str, latency: float, valid: bool, won: Optional[bool] = None):
+        if self.ledger:
+            self.ledger.record_call(model, task, latency, valid, won)
+
+    # model is None when the optimization was not produced by a known model; nothing is credited then
+    def record_verification(self, model: Optional[str], results_match: bool):
+        if self.ledger and model:
+            self.ledger.record_verification(model, results_match)
@@ -0,0 +1,127 @@
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Optional
+
+from Fingerprint import adapt_optimization, query_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Store defaults
+DEFAULT_RUN_STORE_PATH = ".optimizer_runs.sqlite"
+# Verification modes that executed both queries in full; only these count as verified
+VERIFIED_MODES = ("client", "server")
+# Stored as the model of runs whose optimization came from no known model
+UNKNOWN_MODEL = "unknown"
+
+RUN_COLUMNS = [
+    'run_id', 'fingerprint', 'input_query', 'checked_query', 'optimized_query',
+    'original_time', 'optimized_time', 'results_match', 'verification', 'model', 'created_at',
+]
+
+
+@dataclass(frozen=True)
+class StoredRun:
+    run_id: int
+    fingerprint: str
+    input_query: str
+    checked_query: str
+    optimized_query: str
+    original_time: Optional[float]
+    optimized_time: Optional[float]
+    results_match: Optional[bool]
+    verification: str
+    model: str
+    created_at: float
+    adapted: bool = False  # Queries were carried over from another variant of the same query shape (unverified)
+
+    def comparison_results(self) -> dict:
+        # Same shape as st.session_state.comparison_results
+        return {
+            'original_query': self.input_query,
+            'original_time': self.original_time,
+            'optimized_query': self.optimized_query,
+            'optimized_time': self.optimized_time,
+            'results_match': self.results_match,
+        }
+
+
+class RunStore:
+    """SQLite store of optimization runs, looked up by input query and query fingerprint."""
+
+    def __init__(self, path: str = DEFAULT_RUN_STORE_PATH):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fingerprint TEXT NOT NULL,
+                input_query TEXT NOT NULL,
+                checked_query TEXT NOT NULL,
+                optimized_query TEXT NOT NULL,
+                original_time REAL,
+                optimized_time REAL,
+                results_match INTEGER,
+                verification TEXT NOT NULL,
+                model TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS runs_fingerprint ON runs (fingerprint, results_match, created_at);
+        """)
+        self._db.commit()
+
+    def _to_run(self, row: tuple) -> StoredRun:
+        run = StoredRun(*row)
+        return replace(run, results_match=None if run.results_match is None else bool(run.results_match))
+
+    def record_run(self, input_query: str, checked_query: str, optimized_query: str, original_time: Optional[float],
+                   optimized_time: Optional[float], results_match: Optional[bool], verification: str, model: str) -> int:
+        with self._lock:
+            cursor = self._db.execute(
+                f"INSERT INTO runs ({', '.join(RUN_COLUMNS[1:])}) VALUES ({', '.join(['?'] * (len(RUN_COLUMNS) - 1))})",
+                (query_fingerprint(input_query), input_query, checked_query, optimized_query, original_time, optimized_time,
+                 None if results_match is None else int(bool(results_match)), verification, model, time.time()),
+            )
+            self._db.commit()
+            return cursor.lastrowid
+
+    # Function to find the latest run of exactly this query that executed both queries in full and found matching results
+    def find_verified_run(self, query: str) -> Optional[StoredRun]:
+        placeholders = ', '.join(['?'] * len(VERIFIED_MODES))
+        with self._lock:
+            row = self._db.execute(
+                f"""SELECT {', '.join(RUN_COLUMNS)} FROM runs
+                    WHERE fingerprint = ? AND input_query = ? AND results_match = 1 AND verification IN ({placeholders})
+                    ORDER BY created_at DESC LIMIT 1""",
+                (query_fingerprint(query), query, *VERIFIED_MODES),
+            ).fetchone()
+        return self._to_run(row) if row else None
+
+    # Function to carry a verified run of another variant of this query over by swapping literals
+    # The swap can change what the optimized query means (e.g. a rewritten range bound), so the result is only
+    # a candidate: its timings and results_match are cleared and it has to be run and compared again
+    def find_candidate_run(self, query: str) -> Optional[StoredRun]:
+        placeholders = ', '.join(['?'] * len(VERIFIED_MODES))
+        with self._lock:
+            rows = self._db.execute(
+                f"""SELECT {', '.join(RUN_COLUMNS)} FROM runs
+                    WHERE fingerprint = ? AND input_query != ? AND results_match = 1 AND verification IN ({placeholders})
+                    ORDER BY created_at DESC LIMIT 5""",
+                (query_fingerprint(query), query, *VERIFIED_MODES),
+            ).fetchall()
+        for row in rows:
+            run = self._to_run(row)
+            checked_query = adapt_optimization(run.input_query, run.checked_query, query)
+            optimized_query = adapt_optimization(run.input_query, run.optimized_query, query)
+            if checked_query is not None and optimized_query is not None:
+                logger.info(f"Adapted run {run.run_id} of another variant of this query as an unverified candidate.")
+                return replace(run, input_query=query, checked_query=checked_query, optimized_query=optimized_query,
+                               original_time=None, optimized_time=None, results_match=None, adapted=True)
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM runs")
+            self._db.commit()
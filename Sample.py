@@ -0,0 +1,179 @@
+import logging
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+
+from Compare import ResultFingerprint, fingerprint_cursor
+from Executor import execute_queries_concurrently
+from History import get_query_stats_batch
+
+logger = logging.getLogger(__name__)
+
+# Sampling defaults
+DEFAULT_SAMPLE_PERCENT = 1.0
+DEFAULT_SEED = 42
+# "inline" adds a seeded SAMPLE clause to every table reference; "temp" first copies an unseeded
+# sample of each table into a temporary table (works for views too, and pins the rows for both queries)
+SAMPLE_MODES = ("inline", "temp")
+
+
+@dataclass
+class SampleValidation:
+    mode: str
+    percent: float
+    original_query: str  # The sampled rewrite that was executed
+    optimized_query: str
+    original_fingerprint: ResultFingerprint
+    optimized_fingerprint: ResultFingerprint
+    original_stats: dict
+    optimized_stats: dict
+
+    @property
+    def results_match(self) -> bool:
+        return self.original_fingerprint == self.optimized_fingerprint
+
+    @property
+    def conclusive(self) -> bool:
+        # Two empty samples always match and prove nothing
+        return self.original_fingerprint.row_count > 0 or self.optimized_fingerprint.row_count > 0
+
+
+def _parse_query(query: str) -> exp.Expression:
+    try:
+        statement = sqlglot.parse_one(query, read="snowflake")
+    except SqlglotError as e:
+        raise ValueError(f"Cannot sample a query that does not parse: {str(e).splitlines()[0]}")
+    if not isinstance(statement, exp.Query):
+        raise ValueError("Only SELECT queries can be sampled.")
+    return statement
+
+
+# Function to list the table references of a query that read stored data (CTE names and table functions excluded)
+def _base_table_nodes(statement: exp.Expression) -> List[exp.Table]:
+    cte_names = {cte.alias_or_name.upper() for cte in statement.find_all(exp.CTE)}
+    return [
+        table for table in statement.find_all(exp.Table)
+        if isinstance(table.this, exp.Identifier)
+        and not (not table.args.get('db') and table.name.upper() in cte_names)
+    ]
+
+
+# Function to get a table reference's qualified name, without alias or sample; quoted parts stay quoted
+def _table_name(table: exp.Table) -> str:
+    parts = {key: table.args[key].copy() for key in ('this', 'db', 'catalog') if table.args.get(key)}
+    return exp.Table(**parts).sql(dialect="snowflake")
+
+
+# Function to list the base tables to sample
+# A query that samples a table itself is rejected: replacing or stacking its SAMPLE clause would change its result
+def _tables_to_sample(statement: exp.Expression) -> List[exp.Table]:
+    tables = _base_table_nodes(statement)
+    for table in tables:
+        if table.args.get('sample'):
+            raise ValueError(f"The query already samples {_table_name(table)}; validate it on the full tables instead.")
+    return tables
+
+
+# Function to list the distinct base tables a query reads
+def base_tables(query: str) -> List[str]:
+    return list(dict.fromkeys(_table_name(table) for table in _base_table_nodes(_parse_query(query))))
+
+
+# Function to rewrite a query so every base table is read through a seeded row sample
+# The same seed gives both the original and the optimized query the same rows of each table
+def sample_query(query: str, percent: float = DEFAULT_SAMPLE_PERCENT, seed: int = DEFAULT_SEED) -> str:
+    statement = _parse_query(query)
+    for table in _tables_to_sample(statement):
+        table.set("sample", exp.TableSample(
+            method=exp.var("BERNOULLI"),
+            percent=exp.Literal.number(percent),
+            seed=exp.Literal.number(seed),
+        ))
+    return statement.sql(dialect="snowflake")
+
+
+# Function to point a query's base tables at other tables, keeping the original names as aliases
+def redirect_tables(query: str, mapping: Dict[str, str]) -> str:
+    statement = _parse_query(query)
+    for table in _tables_to_sample(statement):
+        target = mapping.get(_table_name(table))
+        if target is None:
+            continue
+        alias = table.args['alias'].this if table.args.get('alias') else table.this
+        table.replace(exp.to_table(target, dialect="snowflake").as_(alias.copy()))
+    return statement.sql(dialect="snowflake")
+
+
+def _collect_stats(get_connection: Callable, original_id: str, optimized_id: str) -> tuple:
+    stats = get_query_stats_batch(get_connection, [original_id, optimized_id])
+    return stats.get(original_id, {}), stats.get(optimized_id, {})
+
+
+def _validate_inline(get_connection: Callable, original_query: str, optimized_query: str, percent: float, seed: int) -> SampleValidation:
+    sampled = [sample_query(query, percent, seed) for query in (original_query, optimized_query)]
+    original_run, optimized_run = execute_queries_concurrently(get_connection, sampled, result_mode="fingerprint")
+    original_stats, optimized_stats = _collect_stats(get_connection, original_run.query_id, optimized_run.query_id)
+    return SampleValidation("inline", percent, sampled[0], sampled[1], original_run.fingerprint,
+                            optimized_run.fingerprint, original_stats, optimized_stats)
+
+
+def _validate_temp(get_connection: Callable, original_query: str, optimized_query: str, percent: float, seed: int) -> SampleValidation:
+    tables = list(dict.fromkeys(base_tables(original_query) + base_tables(optimized_query)))
+    suffix = uuid.uuid4().hex[:8].upper()
+    mapping = {table: f"SAMPLE_{index}_{suffix}" for index, table in enumerate(tables)}
+    sampled = [redirect_tables(query, mapping) for query in (original_query, optimized_query)]
+    fingerprints, query_ids = [], []
+    # Temporary tables are only visible to their session, so everything runs on one connection
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        try:
+            # No SEED: views reject it, and both queries read the same materialized sample anyway
+            for table, temp_table in mapping.items():
+                cursor.execute(
+                    f"CREATE TEMPORARY TABLE {temp_table} AS "
+                    f"SELECT * FROM {table} SAMPLE BERNOULLI ({float(percent)})"
+                )
+            try:
+                for query in sampled:
+                    cursor.execute(query)
+                    fingerprints.append(fingerprint_cursor(cursor))
+                    query_ids.append(getattr(cursor, "sfqid", None))
+            finally:
+                for temp_table in mapping.values():
+                    cursor.execute(f"DROP TABLE IF EXISTS {temp_table}")
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+    original_stats, optimized_stats = _collect_stats(get_connection, *query_ids)
+    return SampleValidation("temp", percent, sampled[0], sampled[1], fingerprints[0], fingerprints[1],
+                            original_stats, optimized_stats)
+
+
+# Function to compare results and relative cost of two queries on a deterministic sample of their tables
+def validate_on_sample(get_connection: Callable, original_query: str, optimized_query: str,
+                       percent: float = DEFAULT_SAMPLE_PERCENT, seed: int = DEFAULT_SEED,
+                       mode: str = "inline") -> SampleValidation:
+    if mode not in SAMPLE_MODES:
+        raise ValueError(f"Unknown sample mode: {mode}")
+    logger.info(f"Validating on a {percent}% sample ({mode} mode, seed {seed}).")
+    if mode == "temp":
+        validation = _validate_temp(get_connection, original_query, optimized_query, percent, seed)
+    else:
+        validation = _validate_inline(get_connection, original_query, optimized_query, percent, seed)
+    logger.info(f"Sample validation: results match = {validation.results_match}, conclusive = {validation.conclusive}")
+    return validation
+
+
+# Function to estimate the speedup seen on the sample (None when timings are unavailable)
+def sample_speedup(validation: SampleValidation) -> Optional[float]:
+    original_time = validation.original_stats.get('execution_time')
+    optimized_time = validation.optimized_stats.get('execution_time')
+    if not original_time or not optimized_time:
+        return None
+    return original_time / optimized_time
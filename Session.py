@@ -1,14 +1,24 @@
 import streamlit as st
-import pandas as pd
 import snowflake.connector
 import logging
 from datetime import datetime
 import time
+from Pool import SnowflakeConnectionPool, DEFAULT_MIN_SIZE, DEFAULT_MAX_SIZE, DEFAULT_IDLE_TIMEOUT
+from Cache import ResponseCache, DEFAULT_CACHE_PATH, DEFAULT_TTL
+from Fetch import read_arrow
+from Cortex import AsyncCortexClient, DEFAULT_MAX_CONCURRENCY, DEFAULT_RATE_PER_SECOND, DEFAULT_TIMEOUT
+from Executor import run_query
+from History import get_query_stats
+from Lint import lint_query
+from Rewrite import build_optimize_prompt
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Cortex model used for every completion
+CORTEX_MODEL = 'snowflake-arctic'
+
 # Prompts
 system_message = """
     You are a helpful assistant for analyzing and optimizing queries running on Snowflake to reduce resource consumption and improve performance.
@@ -24,18 +34,78 @@ system_message = """
     5. Prepare Summary
 """
 
+# Open a raw Snowflake connection (used by the pool only)
+def connect_snowflake():
+    conn = snowflake.connector.connect(
+        account=st.secrets["snowflake"]["account"],
+        user=st.secrets["snowflake"]["user"],
+        password=st.secrets["snowflake"]["password"],
+        warehouse=st.secrets["snowflake"]["warehouse"],
+        database=st.secrets["snowflake"]["database"],
+        schema=st.secrets["snowflake"]["schema"],
+        # Bind parameters server-side, so statement text stays stable and compiled plans can be reused
+        paramstyle="qmark"
+    )
+    return conn
+
+# Connection pool shared by every session of this Streamlit server
+@st.cache_resource
+def get_connection_pool() -> SnowflakeConnectionPool:
+    pool_settings = st.secrets.get("snowflake_pool", {})
+    return SnowflakeConnectionPool(
+        connect=connect_snowflake,
+        min_size=pool_settings.get("min_size", DEFAULT_MIN_SIZE),
+        max_size=pool_settings.get("max_size", DEFAULT_MAX_SIZE),
+        idle_timeout=pool_settings.get("idle_timeout", DEFAULT_IDLE_TIMEOUT),
+    )
+
 # Define Snowflake connection (Already handled by the user)
+# Connections come from the pool; conn.close() hands them back instead of closing them
 def get_snowflake_connection():
-    conn = None  # Placeholder
-    return conn
+    return get_connection_pool().acquire()
+
+# Completion cache shared by every session of this Streamlit server
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    cache_settings = st.secrets.get("cortex_cache", {})
+    return ResponseCache(
+        path=cache_settings.get("path", DEFAULT_CACHE_PATH),
+        ttl=cache_settings.get("ttl", DEFAULT_TTL),
+    )
+
+# Function to run a single Cortex completion (no caching or retries)
+def run_cortex_complete(prompt: str, model: str) -> str:
+    query = "SELECT SNOWFLAKE.CORTEX.COMPLETE(?, ?);"
+    conn = get_snowflake_connection()
+    try:
+        result = read_arrow(query, conn, params=(model, prompt))
+    finally:
+        conn.close()
+    return result.iloc[0, 0]
+
+# Cortex client shared by every session, so concurrency and rate limits hold server-wide
+@st.cache_resource
+def get_cortex_client() -> AsyncCortexClient:
+    client_settings = st.secrets.get("cortex_client", {})
+    return AsyncCortexClient(
+        run_cortex_complete,
+        max_concurrency=client_settings.get("max_concurrency", DEFAULT_MAX_CONCURRENCY),
+        rate_per_second=client_settings.get("rate_per_second", DEFAULT_RATE_PER_SECOND),
+        timeout=client_settings.get("timeout", DEFAULT_TIMEOUT),
+    )
 
 # Function to use Snowflake Cortex for inference
 def cortex_inference(prompt: str) -> str:
+    cache = get_response_cache()
+    cached_response = cache.get(CORTEX_MODEL, '', prompt)
+    if cached_response is not None:
+        logger.info("Returning cached Cortex response.")
+        return cached_response
+
     logger.info(f"Sending prompt to Snowflake Cortex: {prompt}")
-    query = f"SELECT SNOWFLAKE.CORTEX.COMPLETE('snowflake-arctic', '{prompt}');"
-    conn = get_snowflake_connection()
-    result = pd.read_sql(query, conn)
-    return result.iloc[0, 0]
+    response = get_cortex_client().complete_sync(prompt, CORTEX_MODEL)
+    cache.put(CORTEX_MODEL, '', prompt, response)
+    return response
 
 # Query SQL Checker Tool
 def query_sql_checker_tool(query: str) -> str:
@@ -51,42 +121,40 @@ def query_sql_checker_tool(query: str) -> str:
     - Casting to the correct data type
     - Using the proper columns for joins
     If there are any mistakes, rewrite the query. Output the final SQL query only.
+    """
+    # A clean local lint skips the Cortex round trip; otherwise the findings are passed along
+    report = lint_query(query)
+    if not report.needs_llm_check:
+        logger.info("Local lint found no issues; skipping the Cortex SQL checker.")
+        return query
+    prompt += f"""
+    A local static check reported:
+{report.describe()}
     """
     logger.info("Running SQL checker for common mistakes.")
     return cortex_inference(prompt)
 
-# Function to get query execution time from Snowflake
-def get_execution_time(query: str) -> float:
-    logger.info("Fetching execution time from Snowflake.")
-    conn = get_snowflake_connection()
-    query_history = f"""
-        SELECT query_id, execution_time
-        FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
-        WHERE query_text = '{query}' 
-        AND query_start_time >= DATEADD(day, -7, CURRENT_TIMESTAMP())
-        ORDER BY query_start_time DESC
-        LIMIT 1;
-    """
-    result = pd.read_sql(query_history, conn)
-    if result.empty:
-        logger.error("No matching query found in the history.")
-        raise ValueError("No matching query found in the history.")
-    execution_time = result['execution_time'].iloc[0]
+# Function to get query execution time from Snowflake by query ID
+def get_execution_time(query_id: str) -> float:
+    logger.info(f"Fetching execution time from Snowflake for query ID {query_id}.")
+    execution_time = get_query_stats(get_snowflake_connection, query_id)['execution_time']
     logger.info(f"Execution time retrieved: {execution_time} seconds")
     return execution_time
 
+# Function to run a query and get its execution time via the captured query ID
+def measure_execution_time(query: str) -> float:
+    logger.info("Running query to measure its execution time.")
+    # Only the query ID is needed, so the result is not fetched
+    query_id = run_query(get_snowflake_connection, query, result_mode="none").query_id
+    return get_execution_time(query_id)
+
 # Optimizing the SQL Query with Snowflake Cortex
 def optimize_query(query: str) -> str:
-    prompt = f"Optimize the following query: {query}"
+    prompt = build_optimize_prompt(query)
     logger.info("Optimizing the SQL query using Cortex.")
     optimized_query = cortex_inference(prompt)
     return optimized_query
 
-# Function to remove all single inverted commas (') from the query
-def remove_single_quotes(query: str) -> str:
-    logger.info("Removing single inverted commas from the query.")
-    return query.replace("'", "")
-
 # Streamlit application for SQL optimization
 def main():
     st.title("Snowflake SQL Optimizer with Cortex")
@@ -106,6 +174,11 @@ def main():
     # Inputs from the user
     sql_query = st.text_area("Enter your SQL query:", value=st.session_state.sql_query)
     execution_time_input = st.text_input("Execution Time (optional):", value=str(st.session_state.execution_time) if st.session_state.execution_time else '')
+    # Timing runs the query on the warehouse, so it is opt-in
+    measure_original = st.checkbox(
+        "Measure execution time by running the query",
+        help="Runs the query in Snowflake and uses warehouse credits. Leave unchecked to skip timing.",
+    )
 
     if st.button("Optimize Query"):
         if not sql_query:
@@ -118,12 +191,14 @@ def main():
         # Show progress in UI
         with st.spinner("Processing..."):
             try:
-                # Step 1: Get Execution Time if not provided
-                if not execution_time_input:
-                    st.write("Fetching execution time from Snowflake...")
-                    st.session_state.execution_time = get_execution_time(sql_query)
-                else:
+                # Step 1: Get Execution Time if provided, or measure it if the user opted in
+                if execution_time_input:
                     st.session_state.execution_time = float(execution_time_input)
+                elif measure_original:
+                    st.write("Measuring execution time in Snowflake...")
+                    st.session_state.execution_time = measure_execution_time(sql_query)
+                else:
+                    st.session_state.execution_time = None
 
                 logger.info(f"User-provided SQL query: {sql_query}")
                 logger.info(f"Execution Time: {st.session_state.execution_time} seconds")
@@ -146,22 +221,20 @@ def main():
 
     # Step 4: Run Optimized Query
     if st.session_state.optimized_query:
+        st.caption("Running the optimized query executes it in Snowflake and uses warehouse credits.")
         if st.button("Run Optimized Query"):
             try:
-                # Step 5: Remove single quotes from optimized query
-                optimized_query_no_quotes = remove_single_quotes(st.session_state.optimized_query)
-                st.write("Optimized SQL Query (without single quotes):")
-                st.code(optimized_query_no_quotes)
-
-                # Get execution time of the optimized query
+                # Step 5: Get execution time of the optimized query
                 st.write("Running optimized query...")
-                st.session_state.optimized_execution_time = get_execution_time(optimized_query_no_quotes)
+                st.session_state.optimized_execution_time = measure_execution_time(st.session_state.optimized_query)
 
                 # Step 6: Display comparison of original and optimized queries
                 st.write(f"Original Execution Time: {st.session_state.execution_time} seconds")
                 st.write(f"Optimized Execution Time: {st.session_state.optimized_execution_time} seconds")
 
-                if st.session_state.optimized_execution_time < st.session_state.execution_time:
+                if st.session_state.execution_time is None:
+                    st.info("Enter or measure the original execution time to compare the two queries.")
+                elif st.session_state.optimized_execution_time < st.session_state.execution_time:
                     st.success("The optimized query is faster!")
                 else:
                     st.warning("The optimized query is slower or has no improvement.")
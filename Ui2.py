@@ -1,18 +1,24 @@
 import streamlit as st
 from PIL import Image
-import base64
 
-# Function to encode the image
+from Assets import encode_file, inject_css
+from Chat import chat_turn, get_chat_history, render_chat
+from Claud import cortex_chat_complete
+
+SYSTEM_MESSAGE = (
+    "You are the Nomura Holdings assistant. Answer questions about Nomura Holdings clearly and concisely, "
+    "and say so when you do not know the answer."
+)
+
+# Function to encode the image (cached per process, refreshed when the file changes)
 def encode_image(image_path):
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode()
+    return encode_file(image_path)
 
 # Set page config
 st.set_page_config(page_title="Nomura Holdings Chatbot", layout="wide")
 
-# Custom CSS
-st.markdown("""
-<style>
+# Custom CSS (minified once per process)
+inject_css("""
     .stApp {
         background-color: #FFFFFF;
     }
@@ -48,8 +54,7 @@ st.markdown("""
         background-clip: text;
         background-color: rgba(255,255,255,0.3);
     }
-</style>
-""", unsafe_allow_html=True)
+""")
 
 # Sidebar
 with st.sidebar:
@@ -68,30 +73,32 @@ st.title("Nomura Holdings Chatbot")
 # Main chat interface
 st.header("How can I assist you today?")
 
-# Initialize chat history
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+# Initialize chat history (bounded per session)
+history = get_chat_history()
 
-# Display chat messages from history on app rerun
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
+# Display the most recent chat messages on app rerun; older ones are paged on request
+render_chat(history)
 
 # React to user input
 if prompt := st.chat_input("Enter your question here"):
     # Display user message in chat message container
     st.chat_message("user").markdown(prompt)
     # Add user message to chat history
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    history.append("user", prompt)
 
-    # Generate response from Nomura chatbot (placeholder response)
-    response = f"Thank you for your question about Nomura Holdings. Here's what I found: {prompt}"
-    
-    # Display assistant response in chat message container
+    # Generate response from Cortex; recent turns are sent as context and older ones as a summary
     with st.chat_message("assistant"):
-        st.markdown(response)
+        try:
+            with st.spinner("Thinking..."):
+                reply = chat_turn(history, SYSTEM_MESSAGE, cortex_chat_complete)
+        except Exception as e:
+            st.error(f"Error generating a response: {str(e)}")
+            reply = None
+        if reply is not None:
+            st.markdown(reply.text)
     # Add assistant response to chat history
-    st.session_state.messages.append({"role": "assistant", "content": response})
+    if reply is not None:
+        history.append("assistant", reply.text)
 
 # Footer
 st.markdown("---")
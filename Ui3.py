@@ -1,20 +1,26 @@
 import streamlit as st
-import base64
 
-# Function to get base64 encoded image
+from Assets import asset_url, encode_file, inject_css
+from Chat import chat_turn, get_chat_history, render_chat
+from Claud import cortex_chat_complete
+
+SYSTEM_MESSAGE = (
+    "You are the Nomura Holdings assistant. Answer questions about Nomura Holdings clearly and concisely, "
+    "and say so when you do not know the answer."
+)
+
+# Function to get base64 encoded image (cached per process, refreshed when the file changes)
 def get_base64_of_bin_file(bin_file):
-    with open(bin_file, 'rb') as f:
-        data = f.read()
-    return base64.b64encode(data).decode()
+    return encode_file(bin_file)
 
 # Function to set background image with fade effect
+# The image is referenced by URL (static serving) or a cached data URI instead of being re-encoded every rerun
 def set_background_with_fade(image_file):
-    bin_str = get_base64_of_bin_file(image_file)
-    page_bg_img = f'''
-    <style>
+    image_url = asset_url(image_file)
+    inject_css(f'''
     [data-testid="stSidebar"] {{
         background-image: linear-gradient(to bottom, rgba(237, 28, 36, 0), rgba(237, 28, 36, 1) 30%),
-                          url("data:image/png;base64,{bin_str}");
+                          url("{image_url}");
         background-size: cover;
         background-position: top center;
         background-repeat: no-repeat;
@@ -32,16 +38,13 @@ def set_background_with_fade(image_file):
     [data-testid="stSidebar"] .css-pkbazv {{
         color: white;
     }}
-    </style>
-    '''
-    st.markdown(page_bg_img, unsafe_allow_html=True)
+    ''')
 
 # Set page config
 st.set_page_config(page_title="Nomura Holdings Chatbot", layout="wide")
 
-# Custom CSS
-st.markdown("""
-<style>
+# Custom CSS (minified once per process)
+inject_css("""
     .stApp {
         background-color: #FFFFFF;
     }
@@ -68,8 +71,7 @@ st.markdown("""
         position: relative;
         z-index: 1;
     }
-</style>
-""", unsafe_allow_html=True)
+""")
 
 # Set background with fade effect
 set_background_with_fade('path_to_nomura_logo.png')  # Replace with actual path to Nomura logo
@@ -92,30 +94,32 @@ st.title("Nomura Holdings Chatbot")
 # Main chat interface
 st.header("How can I assist you today?")
 
-# Initialize chat history
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+# Initialize chat history (bounded per session)
+history = get_chat_history()
 
-# Display chat messages from history on app rerun
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
+# Display the most recent chat messages on app rerun; older ones are paged on request
+render_chat(history)
 
 # React to user input
 if prompt := st.chat_input("Enter your question here"):
     # Display user message in chat message container
     st.chat_message("user").markdown(prompt)
     # Add user message to chat history
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    history.append("user", prompt)
 
-    # Generate response from Nomura chatbot (placeholder response)
-    response = f"Thank you for your question about Nomura Holdings. Here's what I found: {prompt}"
-    
-    # Display assistant response in chat message container
+    # Generate response from Cortex; recent turns are sent as context and older ones as a summary
     with st.chat_message("assistant"):
-        st.markdown(response)
+        try:
+            with st.spinner("Thinking..."):
+                reply = chat_turn(history, SYSTEM_MESSAGE, cortex_chat_complete)
+        except Exception as e:
+            st.error(f"Error generating a response: {str(e)}")
+            reply = None
+        if reply is not None:
+            st.markdown(reply.text)
     # Add assistant response to chat history
-    st.session_state.messages.append({"role": "assistant", "content": response})
+    if reply is not None:
+        history.append("assistant", reply.text)
 
 # Footer
 st.markdown("---")
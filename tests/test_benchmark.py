@@ -0,0 +1,87 @@
+import itertools
+
+import pandas as pd
+import pytest
+
+import Benchmark
+from Benchmark import benchmark_queries, bootstrap_speedup_ci, mann_whitney_u, summarize_trials
+
+
+def make_trials(original, optimized):
+    rows = [
+        {'variant': variant, 'trial': trial, 'compilation_time': 0.0, 'execution_time': value,
+         'queued_time': 0.0, 'server_time': value}
+        for variant, values in (('original', original), ('optimized', optimized))
+        for trial, value in enumerate(values)
+    ]
+    return pd.DataFrame(rows)
+
+
+def test_mann_whitney_separates_disjoint_samples():
+    _, p_value = mann_whitney_u([10, 11, 12, 13, 14, 15], [1, 2, 3, 4, 5, 6])
+    assert p_value < 0.01
+
+
+def test_mann_whitney_identical_samples_are_not_significant():
+    assert mann_whitney_u([1, 1, 1], [1, 1, 1]) == (4.5, 1.0)
+
+
+def test_bootstrap_interval_brackets_the_speedup():
+    low, high = bootstrap_speedup_ci([4.0, 4.1, 3.9, 4.0], [2.0, 2.1, 1.9, 2.0])
+    assert low <= 2.0 <= high
+
+
+def test_clear_speedup_is_faster():
+    result = summarize_trials(make_trials([10, 11, 12, 10, 11, 12], [5, 6, 5, 6, 5, 6]))
+    assert result.verdict == "faster"
+    assert result.speedup == pytest.approx(11 / 5.5)
+    assert list(result.summary.index) == ["original", "optimized"]
+
+
+def test_overlapping_timings_are_not_significant():
+    result = summarize_trials(make_trials([5, 6, 5, 6], [6, 5, 6, 5]))
+    assert result.verdict == "no significant difference"
+
+
+def test_missing_variant_is_rejected():
+    with pytest.raises(ValueError):
+        summarize_trials(make_trials([1, 2, 3], []))
+
+
+class FakeCursor:
+    def __init__(self, log, ids):
+        self.log, self.ids, self.sfqid = log, ids, None
+
+    def execute(self, query):
+        self.log.append(query)
+        self.sfqid = next(self.ids)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, log):
+        self.log, self.ids, self.closed = log, (f"q{i}" for i in itertools.count()), False
+
+    def cursor(self):
+        return FakeCursor(self.log, self.ids)
+
+    def close(self):
+        self.closed = True
+
+
+def test_benchmark_interleaves_runs_and_restores_the_result_cache(monkeypatch):
+    log = []
+    conn = FakeConnection(log)
+    monkeypatch.setattr(Benchmark, "get_query_stats_batch", lambda get_connection, query_ids: {
+        query_id: {'compilation_time': 0.1, 'execution_time': 1.0, 'queued_time': 0.0} for query_id in query_ids
+    })
+    result = benchmark_queries(lambda: conn, "ORIGINAL", "OPTIMIZED", trials=4, warmups=1)
+
+    assert log[0] == "ALTER SESSION SET USE_CACHED_RESULT = FALSE"
+    assert log[-1] == "ALTER SESSION UNSET USE_CACHED_RESULT"
+    assert log[1:-1] == ["ORIGINAL", "OPTIMIZED"] + ["ORIGINAL", "OPTIMIZED", "OPTIMIZED", "ORIGINAL"] * 2
+    assert conn.closed
+    assert len(result.trials) == 8
+    assert result.verdict == "no significant difference"
@@ -0,0 +1,59 @@
+import time
+
+from Cache import ResponseCache, make_cache_key, normalize_prompt
+
+
+def test_normalize_prompt_strips_surrounding_whitespace():
+    assert normalize_prompt("\n  SELECT 1  \n") == "SELECT 1"
+
+
+def test_line_break_ending_a_comment_is_kept():
+    with_break = "SELECT a -- first column\nFROM t"
+    without_break = "SELECT a -- first column FROM t"
+    assert make_cache_key("m", "sys", with_break) != make_cache_key("m", "sys", without_break)
+
+
+def test_whitespace_inside_quoted_identifiers_is_kept():
+    assert make_cache_key("m", "sys", 'SELECT "a  b" FROM t') != make_cache_key("m", "sys", 'SELECT "a b" FROM t')
+
+
+def test_cache_key_depends_on_model():
+    assert make_cache_key("a", "sys", "SELECT 1") != make_cache_key("b", "sys", "SELECT 1")
+
+
+def test_put_then_get_hits_memory_then_disk(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path=path)
+    cache.put("m", "sys", "SELECT 1", "answer")
+    assert cache.get("m", "sys", " SELECT 1\n") == "answer"
+    assert cache.stats()['memory_hits'] == 1
+
+    reopened = ResponseCache(path=path)
+    assert reopened.get("m", "sys", "SELECT 1") == "answer"
+    assert reopened.stats()['disk_hits'] == 1
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite"), ttl=0.01)
+    cache.put("m", "sys", "SELECT 1", "answer")
+    time.sleep(0.05)
+    assert cache.get("m", "sys", "SELECT 1") is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResponseCache(path=None, max_memory_entries=2)
+    cache.put("m", "sys", "a", "1")
+    cache.put("m", "sys", "b", "2")
+    cache.get("m", "sys", "a")
+    cache.put("m", "sys", "c", "3")
+    assert cache.get("m", "sys", "b") is None
+    assert cache.get("m", "sys", "a") == "1"
+    assert cache.get("m", "sys", "c") == "3"
+
+
+def test_disk_tier_is_bounded(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite"), max_memory_entries=1, max_disk_entries=2)
+    for prompt in ("a", "b", "c"):
+        cache.put("m", "sys", prompt, prompt.upper())
+    assert cache._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 2
@@ -0,0 +1,96 @@
+import json
+
+from Chat import (
+    SUMMARY_BATCH_MESSAGES,
+    ChatHistory,
+    build_chat_messages,
+    chat_turn,
+    estimate_tokens,
+    parse_chat_response,
+)
+
+SYSTEM = "You are a helpful assistant."
+
+
+class FakeCortex:
+    """complete(payload) stand-in: records every messages array and answers summaries and chat turns."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, payload):
+        messages = json.loads(payload)
+        self.calls.append(messages)
+        if messages[0]['content'].startswith("Summarize"):
+            return json.dumps({'choices': [{'messages': f"summary #{len(self.calls)}"}], 'usage': {}})
+        return json.dumps({'choices': [{'messages': "answer"}], 'usage': {'prompt_tokens': 10, 'completion_tokens': 1}})
+
+    def summaries(self):
+        return [messages for messages in self.calls if messages[0]['content'].startswith("Summarize")]
+
+
+def prompt_tokens(messages):
+    return sum(estimate_tokens(message['content']) for message in messages)
+
+
+def test_history_is_bounded():
+    history = ChatHistory(max_messages=3, max_chars=1000)
+    for i in range(5):
+        history.append("user", f"message {i}")
+    assert [content for _, content in history] == ["message 2", "message 3", "message 4"]
+    assert history.dropped == 2
+    assert [position for position, _, _ in history.messages_since(0)] == [2, 3, 4]
+
+
+def test_short_chat_fits_without_summary():
+    history = ChatHistory()
+    history.append("user", "hello")
+    messages, overflow = build_chat_messages(history, SYSTEM, budget=1000)
+    assert [message['content'] for message in messages] == [SYSTEM, "hello"]
+    assert overflow == []
+
+
+def test_every_turn_is_in_the_prompt_or_the_summary():
+    history = ChatHistory()
+    cortex = FakeCortex()
+    budget = 200
+    for i in range(40):
+        history.append("user", f"question {i} " + "x" * 100)
+        reply = chat_turn(history, SYSTEM, cortex, budget=budget)
+        history.append("assistant", reply.text)
+        prompt = cortex.calls[-1]
+        assert prompt_tokens(prompt) <= budget
+        # Turns before summarized_upto are in the summary; every later one must be in the prompt
+        sent = [message['content'] for message in prompt]
+        for position, role, content in history.messages_since(history.summarized_upto)[:-1]:
+            assert content in sent, f"turn {position} is neither summarized nor sent"
+        assert sent[-1].startswith(f"question {i}")
+
+
+def test_summaries_are_batched():
+    history = ChatHistory()
+    cortex = FakeCortex()
+    turns = 30
+    for i in range(turns):
+        history.append("user", f"question {i} " + "x" * 100)
+        history.append("assistant", chat_turn(history, SYSTEM, cortex, budget=200).text)
+    summaries = cortex.summaries()
+    assert summaries
+    assert len(summaries) <= 2 * turns / SUMMARY_BATCH_MESSAGES
+    # Each summary carries the previous one forward
+    assert "Earlier summary: summary #" in summaries[-1][1]['content']
+
+
+def test_oversized_latest_message_is_truncated():
+    history = ChatHistory()
+    history.append("user", "y" * 10_000)
+    messages, overflow = build_chat_messages(history, SYSTEM, budget=100)
+    assert overflow == []
+    assert prompt_tokens(messages) <= 101
+    assert messages[-1]['content'].endswith("y")
+
+
+def test_parse_chat_response():
+    reply = parse_chat_response(json.dumps({'choices': [{'messages': "hi"}], 'usage': {'prompt_tokens': 5}}))
+    assert (reply.text, reply.prompt_tokens, reply.completion_tokens) == ("hi", 5, None)
+    assert parse_chat_response("plain text").text == "plain text"
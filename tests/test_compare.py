@@ -0,0 +1,52 @@
+import pandas as pd
+
+from Compare import ResultFingerprint, build_result_summary_sql, fingerprint_dataframe, query_results_equal
+from Pool import SnowflakeConnectionPool, connect_local
+
+
+def test_fingerprint_ignores_row_and_column_order():
+    df = pd.DataFrame({'id': [1, 2, 3], 'name': ['a', 'b', None]})
+    shuffled = pd.DataFrame({'NAME': [None, 'a', 'b'], 'ID': [3, 1, 2]})
+    assert fingerprint_dataframe(df) == fingerprint_dataframe(shuffled)
+
+
+def test_fingerprint_counts_duplicate_rows():
+    df = pd.DataFrame({'id': [1, 1, 2]})
+    assert fingerprint_dataframe(df) != fingerprint_dataframe(pd.DataFrame({'id': [1, 2, 2]}))
+    assert fingerprint_dataframe(df) != fingerprint_dataframe(pd.DataFrame({'id': [1, 2]}))
+
+
+def test_fingerprint_is_batch_size_independent():
+    df = pd.DataFrame({'id': range(10), 'value': [i * 1.5 for i in range(10)]})
+    assert fingerprint_dataframe(df, batch_size=3) == fingerprint_dataframe(df)
+
+
+def test_fingerprint_handles_duplicate_column_names():
+    df = pd.DataFrame([[1, 10], [2, 20]], columns=['ID', 'ID'])
+    same = pd.DataFrame([[2, 20], [1, 10]], columns=['ID', 'ID'])
+    different = pd.DataFrame([[1, 20], [2, 10]], columns=['ID', 'ID'])
+    assert fingerprint_dataframe(df) == fingerprint_dataframe(same)
+    assert fingerprint_dataframe(df) != fingerprint_dataframe(different)
+    assert ResultFingerprint(['id', 'ID']).columns == ['ID', 'ID']
+
+
+def test_query_results_equal_on_local_connection(tmp_path):
+    database = str(tmp_path / "local.sqlite")
+    setup = connect_local(database)
+    setup.cursor().execute("CREATE TABLE t (id INTEGER, region TEXT)")
+    for row in [(1, 'EU'), (2, 'US'), (3, 'EU')]:
+        setup.cursor().execute("INSERT INTO t VALUES (?, ?)", row)
+    setup.commit()
+    setup.close()
+    pool = SnowflakeConnectionPool(lambda: connect_local(database), min_size=0, max_size=2)
+    assert query_results_equal(pool.acquire, "SELECT id, region FROM t",
+                               "SELECT region, id FROM t WHERE region = 'EU' UNION ALL SELECT region, id FROM t WHERE region <> 'EU'")
+    assert not query_results_equal(pool.acquire, "SELECT id FROM t", "SELECT id FROM t WHERE id > ?",
+                                   optimized_params=(1,))
+    assert pool.stats()['in_use'] == 0
+
+
+def test_result_summary_sql_quotes_columns():
+    sql = build_result_summary_sql(['b', 'A"x'])
+    assert 'HASH_AGG("A""x", "b")' in sql
+    assert 'RESULT_SCAN(?)' in sql
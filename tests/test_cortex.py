@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from Cortex import AsyncCortexClient, is_transient_error
+
+
+class FakeCompletion:
+    """complete_fn stand-in that records its calls and fails or stalls on request."""
+
+    def __init__(self, failures=(), delay=0.0):
+        self.failures = list(failures)
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt, model):
+        with self._lock:
+            self.calls.append((prompt, model))
+            failure = self.failures.pop(0) if self.failures else None
+        time.sleep(self.delay)
+        if failure is not None:
+            raise failure
+        return f"{model}: {prompt}"
+
+
+@pytest.fixture
+def make_client():
+    clients = []
+
+    def make(complete_fn, **kwargs):
+        kwargs.setdefault("rate_per_second", 1000.0)
+        kwargs.setdefault("base_delay", 0.001)
+        client = AsyncCortexClient(complete_fn, **kwargs)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+def test_transient_errors():
+    assert is_transient_error(RuntimeError("429 Too Many Requests"))
+    assert is_transient_error(ConnectionError("reset by peer"))
+    assert not is_transient_error(RuntimeError("SQL compilation error"))
+    assert not is_transient_error(asyncio.TimeoutError())
+
+
+def test_transient_error_is_retried(make_client):
+    complete_fn = FakeCompletion(failures=[RuntimeError("503 Service Unavailable")])
+    client = make_client(complete_fn)
+    assert client.complete_sync("prompt", "model-a") == "model-a: prompt"
+    assert len(complete_fn.calls) == 2
+    assert client.stats()['retries'] == 1
+
+
+def test_permanent_error_is_not_retried(make_client):
+    complete_fn = FakeCompletion(failures=[RuntimeError("SQL compilation error")])
+    client = make_client(complete_fn)
+    with pytest.raises(RuntimeError):
+        client.complete_sync("prompt", "model-a")
+    assert len(complete_fn.calls) == 1
+
+
+def test_timeout_is_not_retried(make_client):
+    complete_fn = FakeCompletion(delay=0.3)
+    client = make_client(complete_fn, timeout=0.05, is_retryable=lambda error: True)
+    with pytest.raises(asyncio.TimeoutError):
+        client.complete_sync("prompt", "model-a")
+    assert len(complete_fn.calls) == 1
+    assert client.stats()['timeouts'] == 1
+
+
+def test_race_returns_first_accepted_response(make_client):
+    delays = {'slow': 0.3, 'fast': 0.0}
+    client = make_client(lambda prompt, model: time.sleep(delays[model]) or model)
+    results = []
+    model, response = client.race_sync("prompt", ['slow', 'fast'], on_result=lambda *args: results.append(args[0]))
+    assert (model, response) == ('fast', 'fast')
+    assert results == ['fast']
+
+
+def test_race_skips_rejected_responses(make_client):
+    delays = {'slow': 0.1, 'fast': 0.0}
+    client = make_client(lambda prompt, model: time.sleep(delays[model]) or model)
+    model, _ = client.race_sync("prompt", ['slow', 'fast'], accept=lambda response: response == 'slow')
+    assert model == 'slow'
+
+
+def test_per_call_complete_fn_shares_the_client_limits(make_client):
+    active, overlaps = [], []
+    lock = threading.Lock()
+
+    def tracked(name):
+        def complete_fn(prompt, model):
+            with lock:
+                active.append(name)
+                overlaps.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.remove(name)
+            return f"{name}: {prompt}"
+        return complete_fn
+
+    client = make_client(tracked("default"), max_concurrency=1)
+    chat_fn = tracked("chat")
+    threads = [
+        threading.Thread(target=client.complete_sync, args=("prompt", "model-a")),
+        threading.Thread(target=client.complete_sync, args=("payload", "model-a"), kwargs={'complete_fn': chat_fn}),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(overlaps) == 1
+    assert client.complete_sync("payload", "model-a", complete_fn=chat_fn) == "chat: payload"
+    assert client.stats()['calls'] == 3
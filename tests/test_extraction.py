@@ -0,0 +1,88 @@
+from Extraction import FenceParser, extract_code, extract_sql, parse_response, tee_to_parser
+
+FENCED_SECTIONS = """Here is my answer.
+
+-- Original Query
+```sql
+SELECT * FROM orders WHERE status = 'open'
+```
+
+-- Optimized Query
+```sql
+SELECT order_id, amount
+FROM orders
+WHERE status = 'open'
+```
+This version selects only the columns that are used.
+
+-- Explanation of Changes
+Replaced SELECT * with the needed columns.
+"""
+
+UNFENCED_SECTIONS = """-- Original Query
+SELECT * FROM orders;
+
+-- Optimized Query
+SELECT order_id FROM orders;
+
+-- Explanation of Changes
+Fewer columns are read.
+
+-- Verification Statement
+Both queries return the same order IDs.
+"""
+
+
+def test_fenced_section_ends_with_its_fence():
+    parser = parse_response(FENCED_SECTIONS)
+    assert parser.optimized_code() == "SELECT order_id, amount\nFROM orders\nWHERE status = 'open'"
+    assert parser.sections['original'] == "SELECT * FROM orders WHERE status = 'open'"
+    assert parser.sections['explanation'] == "Replaced SELECT * with the needed columns."
+
+
+def test_unfenced_sections_run_to_the_next_header():
+    parser = parse_response(UNFENCED_SECTIONS)
+    assert parser.sections == {
+        'original': "SELECT * FROM orders;",
+        'optimized': "SELECT order_id FROM orders;",
+        'explanation': "Fewer columns are read.",
+        'verification': "Both queries return the same order IDs.",
+    }
+
+
+def test_headers_inside_one_fence():
+    text = "```sql\n-- Original Query\nSELECT 1\n-- Optimized Query\nSELECT 2\n```\nDone."
+    parser = parse_response(text)
+    assert parser.sections['original'] == "SELECT 1"
+    assert parser.optimized_code() == "SELECT 2"
+
+
+def test_markdown_headers_are_sections():
+    text = "## Optimized Query\n```sql\nSELECT 2\n```\nThat is faster.\n"
+    assert extract_sql(text) == "SELECT 2"
+
+
+def test_streamed_chunks_parse_like_the_whole_text():
+    chunks = [FENCED_SECTIONS[i:i + 7] for i in range(0, len(FENCED_SECTIONS), 7)]
+    parser = FenceParser()
+    assert "".join(tee_to_parser(iter(chunks), parser)) == FENCED_SECTIONS
+    streamed = parser.close()
+    whole = parse_response(FENCED_SECTIONS)
+    assert streamed.blocks == whole.blocks
+    assert streamed.sections == whole.sections
+
+
+def test_first_sql_block_after_an_optimization_mention():
+    text = "Original:\n```sql\nSELECT 1\n```\nThe optimized version:\n```python\nprint(1)\n```\n```sql\nSELECT 2\n```"
+    assert extract_code(text) == "SELECT 2"
+
+
+def test_truncated_fence_is_flushed():
+    parser = parse_response("Optimized query below\n```sql\nSELECT 3")
+    assert parser.blocks == [('sql', 'SELECT 3', True)]
+
+
+def test_extract_sql_fallbacks():
+    assert extract_sql("```sql\nSELECT 4\n```") == "SELECT 4"
+    assert extract_sql("  SELECT 5  ") == "SELECT 5"
+    assert extract_code("No code here.") is None
@@ -0,0 +1,39 @@
+from Fingerprint import adapt_optimization, normalize_query, query_fingerprint
+
+
+def test_variants_share_a_fingerprint():
+    assert query_fingerprint("SELECT * FROM orders WHERE id = 1") == query_fingerprint("select *\n  from ORDERS where ID = 42")
+    assert query_fingerprint("SELECT a FROM t WHERE b IN (1, 2)") == query_fingerprint("SELECT a FROM t WHERE b IN (3, 4, 5)")
+    assert query_fingerprint("SELECT a FROM t WHERE c = 'x'") == query_fingerprint("SELECT a FROM t WHERE c = 'it''s'")
+
+
+def test_different_shapes_differ():
+    assert query_fingerprint("SELECT a FROM t WHERE b = 1") != query_fingerprint("SELECT a FROM t WHERE b > 1")
+    assert query_fingerprint("SELECT a FROM t") != query_fingerprint("SELECT a FROM u")
+
+
+def test_quoted_identifiers_keep_their_case():
+    assert query_fingerprint('SELECT "a" FROM t') != query_fingerprint('SELECT "A" FROM t')
+
+
+def test_unparseable_text_falls_back_to_regex_normalization():
+    assert normalize_query("FROBNICATE 'x' WITH 12") == normalize_query("frobnicate   'y' with 7")
+
+
+def test_adapt_optimization_swaps_literals():
+    adapted = adapt_optimization(
+        "SELECT id FROM t WHERE region = 'EU' AND amount > 10",
+        "SELECT id FROM t WHERE amount > 10 AND region = 'EU'",
+        "SELECT id FROM t WHERE region = 'US' AND amount > 99",
+    )
+    assert "'US'" in adapted and "99" in adapted
+    assert "'EU'" not in adapted and "10" not in adapted
+
+
+def test_adapt_optimization_refuses_ambiguous_mappings():
+    # The same old literal would need two different replacements
+    assert adapt_optimization("SELECT 1 FROM t WHERE a = 1 AND b = 1", "SELECT 1 FROM t WHERE a = 1 AND b = 1",
+                              "SELECT 1 FROM t WHERE a = 2 AND b = 3") is None
+    # IN lists of different lengths
+    assert adapt_optimization("SELECT a FROM t WHERE b IN (1, 2)", "SELECT a FROM t WHERE b IN (1, 2)",
+                              "SELECT a FROM t WHERE b IN (1, 2, 3)") is None
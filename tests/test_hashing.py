@@ -0,0 +1,53 @@
+import datetime
+import decimal
+
+import numpy as np
+import pandas as pd
+
+from Hashing import NULL_HASH, hash_column, hash_rows
+
+
+def test_equal_numbers_hash_equally_across_types():
+    ints = hash_column(pd.Series([1, 2, 3]))
+    floats = hash_column(pd.Series([1.0, 2.0, 3.0]))
+    decimals = hash_column(pd.Series([decimal.Decimal("1.00"), decimal.Decimal("2"), decimal.Decimal("3.0")]))
+    assert np.array_equal(ints, floats)
+    assert np.array_equal(ints, decimals)
+
+
+def test_nulls_share_one_hash():
+    for series in (pd.Series([None], dtype=object), pd.Series([np.nan]), pd.Series([pd.NaT]),
+                   pd.Series([pd.NA], dtype="Int64")):
+        assert hash_column(series)[0] == NULL_HASH
+
+
+def test_negative_zero_and_float_rounding():
+    assert hash_column(pd.Series([-0.0]))[0] == hash_column(pd.Series([0.0]))[0]
+    rounded = hash_column(pd.Series([0.1 + 0.2]), float_decimals=9)
+    assert rounded[0] == hash_column(pd.Series([0.3]), float_decimals=9)[0]
+
+
+def test_timestamps_hash_as_utc():
+    naive = pd.Series([datetime.datetime(2024, 1, 1, 12)])
+    aware = pd.Series([pd.Timestamp("2024-01-01 13:00", tz="Europe/Paris")])
+    assert hash_column(naive)[0] == hash_column(aware)[0]
+
+
+def test_row_hashes_ignore_column_order_and_case():
+    df = pd.DataFrame({'a': [1, 2], 'B': ['x', 'y']})
+    reordered = pd.DataFrame({'b': ['x', 'y'], 'A': [1, 2]})
+    assert np.array_equal(hash_rows(df), hash_rows(reordered))
+
+
+def test_row_hashes_depend_on_values():
+    df = pd.DataFrame({'a': [1, 2], 'b': [2, 1]})
+    swapped = pd.DataFrame({'a': [2, 1], 'b': [2, 1]})
+    assert not np.array_equal(hash_rows(df), hash_rows(swapped))
+
+
+def test_duplicate_column_names_are_hashed_by_position():
+    df = pd.DataFrame([[1, 2], [3, 4]], columns=['ID', 'ID'])
+    hashes = hash_rows(df)
+    assert len(hashes) == 2
+    assert not np.array_equal(hashes, hash_rows(pd.DataFrame([[2, 1], [4, 3]], columns=['ID', 'ID'])))
+    assert np.array_equal(hashes, hash_rows(pd.DataFrame([[1, 2], [3, 4]], columns=['ID', 'ID'])))
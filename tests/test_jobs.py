@@ -0,0 +1,60 @@
+import threading
+import time
+
+from Jobs import JobQueue, job_status_message
+
+
+def wait_for(queue, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while not queue.get(job_id).done:
+        assert time.time() < deadline, "job did not finish"
+        time.sleep(0.01)
+    return queue.get(job_id)
+
+
+def test_job_result_is_kept_for_polling():
+    queue = JobQueue(max_workers=1)
+    job_id = queue.submit("compare", lambda a, b=0: a + b, 1, b=2)
+    job = wait_for(queue, job_id)
+    assert job.state == "succeeded"
+    assert job.result == 3
+    assert job.error is None
+    queue.shutdown()
+
+
+def test_failed_job_records_the_error():
+    def fail():
+        raise RuntimeError("warehouse suspended")
+
+    queue = JobQueue(max_workers=1)
+    job = wait_for(queue, queue.submit("compare", fail))
+    assert job.state == "failed"
+    assert job.error == "warehouse suspended"
+    queue.shutdown()
+
+
+def test_queued_job_waits_for_a_free_worker():
+    release = threading.Event()
+    queue = JobQueue(max_workers=1)
+    running = queue.submit("compare", release.wait)
+    queued = queue.submit("compare", lambda: None)
+    assert queue.get(queued).state == "queued"
+    assert "queued" in job_status_message(queue.get(queued))
+    release.set()
+    assert wait_for(queue, running).state == "succeeded"
+    assert wait_for(queue, queued).state == "succeeded"
+    queue.shutdown()
+
+
+def test_only_finished_jobs_are_forgotten():
+    release = threading.Event()
+    queue = JobQueue(max_workers=1, max_jobs=2)
+    first = queue.submit("compare", lambda: None)
+    wait_for(queue, first)
+    blocked = queue.submit("compare", release.wait)
+    waiting = queue.submit("benchmark", lambda: None)
+    assert queue.get(first) is None
+    assert [job.job_id for job in queue.jobs()] == [blocked, waiting]
+    assert [job.job_id for job in queue.jobs("benchmark")] == [waiting]
+    release.set()
+    queue.shutdown()
@@ -0,0 +1,50 @@
+from Lint import lint_query
+
+
+def _rules(query):
+    return {finding.rule for finding in lint_query(query).findings}
+
+
+def test_clean_query_needs_no_llm_check():
+    report = lint_query("SELECT id FROM orders WHERE status = 'open'")
+    assert report.findings == []
+    assert not report.needs_llm_check
+
+
+def test_not_in_over_subquery_is_flagged():
+    assert "not-in-null" in _rules("SELECT id FROM a WHERE id NOT IN (SELECT a_id FROM b)")
+
+
+def test_not_in_list_with_null_is_flagged():
+    assert "not-in-null" in _rules("SELECT id FROM a WHERE id NOT IN (1, NULL)")
+
+
+def test_union_distinct_is_flagged_but_union_all_is_not():
+    assert "union-distinct" in _rules("SELECT a FROM t UNION SELECT a FROM u")
+    assert "union-distinct" not in _rules("SELECT a FROM t UNION ALL SELECT a FROM u")
+
+
+def test_between_on_dates_is_flagged():
+    assert "between-range" in _rules("SELECT * FROM t WHERE order_date BETWEEN '2024-01-01' AND '2024-01-31'")
+    assert "between-range" not in _rules("SELECT * FROM t WHERE amount BETWEEN 1 AND 10")
+
+
+def test_join_on_columns_of_one_table_is_flagged():
+    assert "join-columns" in _rules("SELECT * FROM a JOIN b ON a.id = a.parent_id")
+    assert "join-columns" not in _rules("SELECT * FROM a JOIN b ON a.id = b.a_id")
+
+
+def test_string_compared_with_number_is_flagged():
+    assert "literal-type-mismatch" in _rules("SELECT * FROM t WHERE '1' = 1")
+
+
+def test_unparseable_and_non_select_queries_are_ambiguous():
+    assert lint_query("SELEC FROM WHERE (").ambiguous
+    assert lint_query("DELETE FROM t").ambiguous
+    assert lint_query("SELECT 1; SELECT 2").ambiguous
+
+
+def test_unknown_functions_are_ambiguous():
+    report = lint_query("SELECT my_udf(a) FROM t")
+    assert report.ambiguous
+    assert report.needs_llm_check
@@ -0,0 +1,62 @@
+import gc
+
+import pytest
+
+from Executor import run_query
+from Pool import SnowflakeConnectionPool, connect_local
+
+
+def make_pool(**kwargs):
+    return SnowflakeConnectionPool(connect_local, min_size=0, max_size=1, acquire_timeout=0.5, **kwargs)
+
+
+def test_close_returns_connection_for_reuse():
+    pool = make_pool()
+    conn = pool.acquire()
+    raw = conn.raw
+    conn.close()
+    assert pool.stats()['in_use'] == 0
+    assert pool.acquire().raw is raw
+    assert pool.stats()['created'] == 1
+
+
+def test_closed_connection_rejects_use():
+    pool = make_pool()
+    conn = pool.acquire()
+    conn.close()
+    with pytest.raises(RuntimeError):
+        conn.cursor()
+
+
+def test_failed_query_releases_connection():
+    pool = make_pool()
+    with pytest.raises(Exception):
+        run_query(pool.acquire, "SELECT * FROM missing_table")
+    assert pool.stats()['in_use'] == 0
+    assert run_query(pool.acquire, "SELECT 1 AS one").result.iloc[0, 0] == 1
+
+
+def test_abandoned_connection_is_returned_when_collected():
+    pool = make_pool()
+    conn = pool.acquire()
+    del conn
+    gc.collect()
+    assert pool.stats()['in_use'] == 0
+    pool.acquire().close()
+
+
+def test_exhausted_pool_times_out():
+    pool = make_pool()
+    held = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.1)
+    held.close()
+
+
+def test_discard_frees_slot():
+    pool = make_pool()
+    conn = pool.acquire()
+    conn.discard()
+    assert pool.stats()['size'] == 0
+    pool.acquire().close()
+    assert pool.stats()['created'] == 2
@@ -0,0 +1,43 @@
+import sqlglot
+
+from Rewrite import build_optimize_prompt, rewrite_query
+
+
+def _where(sql):
+    return sqlglot.parse_one(sql, read="snowflake").find(sqlglot.exp.Where)
+
+
+def test_or_equalities_become_in():
+    result = rewrite_query("SELECT * FROM t WHERE status = 'a' OR status = 'b' OR status = 'c'")
+    assert "or-to-in" in result.applied
+    assert _where(result.sql).find(sqlglot.exp.In) is not None
+
+
+def test_or_across_columns_is_left_alone():
+    result = rewrite_query("SELECT * FROM t WHERE a = 1 OR b = 2")
+    assert "or-to-in" not in result.applied
+
+
+def test_cheap_predicates_move_first():
+    result = rewrite_query("SELECT * FROM t WHERE name LIKE '%x%' AND id = 1")
+    assert "predicate-order" in result.applied
+    assert isinstance(_where(result.sql).this.this, sqlglot.exp.EQ)
+
+
+def test_derived_tables_become_ctes():
+    result = rewrite_query("SELECT x.a FROM (SELECT a FROM t) AS x")
+    assert "subqueries-to-ctes" in result.applied
+    assert sqlglot.parse_one(result.sql, read="snowflake").find(sqlglot.exp.CTE) is not None
+
+
+def test_unchanged_and_unparseable_queries_are_returned_as_is():
+    for query in ("SELECT a FROM t WHERE id = 1", "NOT SQL AT ALL ("):
+        result = rewrite_query(query)
+        assert not result.changed
+        assert result.sql == query
+
+
+def test_prompt_lists_applied_rewrites():
+    prompt = build_optimize_prompt("SELECT * FROM t WHERE status = 'a' OR status = 'b'")
+    assert "already been applied: or-to-in" in prompt
+    assert build_optimize_prompt("SELECT 1") == "Optimize the following query: SELECT 1"
@@ -0,0 +1,69 @@
+import pytest
+
+from Router import DEFAULT_TASK_MODELS, MIN_LEDGER_CALLS, ModelLedger, ModelRouter, response_has_valid_sql
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return ModelLedger(path=str(tmp_path / "ledger.sqlite"))
+
+
+def record_calls(ledger, model, latency, valid=True, count=MIN_LEDGER_CALLS):
+    for _ in range(count):
+        ledger.record_call(model, "optimize", latency, valid)
+
+
+def test_response_must_hold_one_query():
+    assert response_has_valid_sql("```sql\nSELECT a FROM t\n```")
+    assert not response_has_valid_sql("SELECT 1; SELECT 2")
+    assert not response_has_valid_sql("DELETE FROM t")
+
+
+def test_fixed_routing_uses_task_defaults():
+    router = ModelRouter(task_models={'check': 'mistral-7b'})
+    assert router.model_for('check') == 'mistral-7b'
+    assert router.models_for('optimize') == [DEFAULT_TASK_MODELS['optimize']]
+
+
+def test_racing_tasks_go_to_every_race_model():
+    router = ModelRouter(race_models=('a', 'b'), race_tasks=('optimize',))
+    assert router.models_for('optimize') == ['a', 'b']
+    assert not ModelRouter(race_models=('a',), race_tasks=('optimize',)).races('optimize')
+
+
+def test_ledger_stats_cover_calls_wins_and_verifications(ledger):
+    ledger.record_call('a', 'optimize', 2.0, True, won=True)
+    ledger.record_call('a', 'optimize', 4.0, False, won=False)
+    ledger.record_verification('a', True)
+    [stats] = ledger.stats('optimize')
+    assert (stats.model, stats.calls, stats.valid_rate, stats.mean_latency, stats.wins) == ('a', 2, 0.5, 3.0, 1)
+    assert (stats.verified_runs, stats.verified_rate) == (1, 1.0)
+    assert ledger.stats('check') == []
+
+
+def test_adaptive_routing_prefers_the_fastest_reliable_model(ledger):
+    record_calls(ledger, 'fast', 1.0)
+    record_calls(ledger, 'slow', 5.0)
+    router = ModelRouter(task_models={'optimize': 'slow'}, race_models=('fast', 'slow'), ledger=ledger, adaptive=True)
+    assert router.model_for('optimize') == 'fast'
+
+
+def test_adaptive_routing_skips_models_without_enough_good_calls(ledger):
+    record_calls(ledger, 'sparse', 1.0, count=MIN_LEDGER_CALLS - 1)
+    record_calls(ledger, 'sloppy', 1.0, valid=False)
+    router = ModelRouter(task_models={'optimize': 'default'}, race_models=('sparse', 'sloppy'), ledger=ledger, adaptive=True)
+    assert router.model_for('optimize') == 'default'
+
+
+def test_failed_verifications_disqualify_a_model(ledger):
+    record_calls(ledger, 'fast', 1.0)
+    record_calls(ledger, 'slow', 5.0)
+    ledger.record_verification('fast', False)
+    router = ModelRouter(task_models={'optimize': 'slow'}, race_models=('fast', 'slow'), ledger=ledger, adaptive=True)
+    assert router.model_for('optimize') == 'slow'
+
+
+def test_unknown_model_gets_no_verification_credit(ledger):
+    ModelRouter(ledger=ledger).record_verification(None, True)
+    assert ledger.stats() == []
+    assert ledger._db.execute("SELECT COUNT(*) FROM verifications").fetchone()[0] == 0
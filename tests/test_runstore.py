@@ -0,0 +1,58 @@
+import pytest
+
+from RunStore import RunStore, UNKNOWN_MODEL
+
+QUERY = "SELECT id FROM orders WHERE region = 'EU'"
+OPTIMIZED = "SELECT id FROM orders WHERE region = 'EU' AND id IS NOT NULL"
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RunStore(path=str(tmp_path / "runs.sqlite"))
+
+
+def record(store, query=QUERY, optimized=OPTIMIZED, results_match=True, verification="client", model="model-a"):
+    return store.record_run(query, query, optimized, 2.0, 1.0, results_match, verification, model)
+
+
+def test_verified_run_is_found_for_the_exact_query(store):
+    record(store)
+    run = store.find_verified_run(QUERY)
+    assert run.optimized_query == OPTIMIZED
+    assert run.results_match is True
+    assert run.model == "model-a"
+    assert run.comparison_results()['optimized_time'] == 1.0
+
+
+def test_unverified_runs_are_not_reused(store):
+    record(store, results_match=False)
+    record(store, verification="sample")
+    record(store, results_match=None, model=UNKNOWN_MODEL)
+    assert store.find_verified_run(QUERY) is None
+
+
+def test_latest_verified_run_wins(store):
+    record(store, optimized="SELECT 1", model="model-a")
+    record(store, optimized="SELECT 2", model="model-b")
+    assert store.find_verified_run(QUERY).model == "model-b"
+
+
+def test_variant_is_only_a_candidate(store):
+    record(store)
+    variant = "SELECT id FROM orders WHERE region = 'US'"
+    assert store.find_verified_run(variant) is None
+    candidate = store.find_candidate_run(variant)
+    assert candidate.adapted
+    assert "'US'" in candidate.optimized_query and "'EU'" not in candidate.optimized_query
+    assert candidate.results_match is None and candidate.original_time is None
+
+
+def test_exact_query_is_not_its_own_candidate(store):
+    record(store)
+    assert store.find_candidate_run(QUERY) is None
+
+
+def test_clear(store):
+    record(store)
+    store.clear()
+    assert store.find_verified_run(QUERY) is None
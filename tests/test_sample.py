@@ -0,0 +1,34 @@
+import pytest
+
+from Sample import base_tables, redirect_tables, sample_query
+
+
+def test_base_tables_skip_ctes_and_keep_quoting():
+    query = 'WITH recent AS (SELECT * FROM db."Orders") SELECT * FROM recent JOIN "lower" l ON 1 = 1 JOIN plain ON 1 = 1'
+    assert sorted(base_tables(query)) == sorted(['db."Orders"', '"lower"', 'plain'])
+
+
+def test_sample_query_seeds_every_base_table():
+    sampled = sample_query("SELECT * FROM a JOIN b ON a.id = b.id WHERE a.x IN (SELECT x FROM c)", percent=5, seed=7)
+    assert sampled.count("TABLESAMPLE BERNOULLI (5) SEED (7)") == 3
+
+
+def test_redirect_tables_keeps_names_as_aliases():
+    query = 'SELECT "lower".a, t.b FROM "lower" JOIN db."My Table" AS t ON 1 = 1'
+    redirected = redirect_tables(query, {'"lower"': 'SAMPLE_0', 'db."My Table"': 'SAMPLE_1'})
+    assert redirected == 'SELECT "lower".a, t.b FROM SAMPLE_0 AS "lower" JOIN SAMPLE_1 AS t ON 1 = 1'
+
+
+@pytest.mark.parametrize("query", ["SELECT * FROM t SAMPLE (10)", "SELECT * FROM t TABLESAMPLE BERNOULLI (5) SEED (1)"])
+def test_queries_that_already_sample_are_rejected(query):
+    with pytest.raises(ValueError, match="already samples"):
+        sample_query(query)
+    with pytest.raises(ValueError, match="already samples"):
+        redirect_tables(query, {'t': 'SAMPLE_0'})
+
+
+def test_only_select_queries_are_sampled():
+    with pytest.raises(ValueError):
+        sample_query("DELETE FROM t")
+    with pytest.raises(ValueError):
+        sample_query("SELECT FROM WHERE (")